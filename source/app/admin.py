@@ -4,12 +4,42 @@ from django.contrib.auth.models import User
 from django import forms
 from django.db import models
 
-from .models import Song, Album, Genre, Artist
+from .jobs import enqueue
+from .models import Song, Album, Genre, Artist, Job
 
 
 # Register your models here.
-admin.site.register(Song)
-admin.site.register(Album)
+@admin.register(Song)
+class SongAdmin(admin.ModelAdmin):
+    list_display = ("title", "artist", "status", "duration", "created_at")
+    list_filter = ("status",)
+    # Song.__str__ reads artist.name
+    list_select_related = ("artist",)
+    search_fields = ("title",)
+    readonly_fields = ("status", "duration", "bitrate", "sample_rate", "file_size", "content_hash")
+
+    def save_model(self, request, obj, form, change):
+        new_audio = "audio_file" in form.changed_data
+        if new_audio:
+            obj.status = Song.PENDING
+        super().save_model(request, obj, form, change)
+        if new_audio:
+            enqueue("process_song", obj.pk)
+
+
+@admin.register(Album)
+class AlbumAdmin(admin.ModelAdmin):
+    list_display = ("name", "user", "created_at")
+    # Album.__str__ reads user.username
+    list_select_related = ("user",)
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("task", "args", "status", "attempts", "run_at", "updated_at")
+    list_filter = ("status", "task")
+
+
 admin.site.register(Genre)
 admin.site.register(Artist)
 
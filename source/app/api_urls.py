@@ -20,9 +20,37 @@ urlpatterns = [
     path("auth/verify/", TokenVerifyView.as_view(), name="token_verify"),
     # Songs
     path("songs/", api_views.SongListAPIView.as_view(), name="api-song-list"),
+    path(
+        "songs/popular/",
+        api_views.PopularSongListAPIView.as_view(),
+        name="api-song-popular",
+    ),
     path(
         "songs/<int:pk>/", api_views.SongDetailAPIView.as_view(), name="api-song-detail"
     ),
+    path(
+        "songs/trending/",
+        api_views.TrendingSongListAPIView.as_view(),
+        name="api-song-trending",
+    ),
+    path("songs/<int:pk>/play/", api_views.song_play, name="api-song-play"),
+    path("songs/<int:pk>/similar/", api_views.song_similar, name="api-song-similar"),
+    path("recommendations/", api_views.recommendations, name="api-recommendations"),
+    path(
+        "songs/<int:pk>/stream/",
+        api_views.SongStreamAPIView.as_view(),
+        name="api-song-stream",
+    ),
+    path(
+        "songs/<int:pk>/waveform/",
+        api_views.SongWaveformAPIView.as_view(),
+        name="api-song-waveform",
+    ),
+    path(
+        "songs/<int:pk>/playlist.m3u8",
+        api_views.SongPlaylistAPIView.as_view(),
+        name="api-song-playlist",
+    ),
     path(
         "songs/<int:song_id>/favorite/",
         api_views.toggle_favorite,
@@ -47,6 +75,11 @@ urlpatterns = [
         api_views.AlbumDetailAPIView.as_view(),
         name="api-album-detail",
     ),
+    path(
+        "albums/<int:album_id>/songs/",
+        api_views.AlbumSongListAPIView.as_view(),
+        name="api-album-songs",
+    ),
     path(
         "albums/<int:album_id>/songs/<int:song_id>/add/",
         api_views.album_add_song,
@@ -66,6 +99,7 @@ urlpatterns = [
     ),
     # Search
     path("search/", api_views.search_songs, name="api-search"),
+    path("search/suggest/", api_views.search_suggest, name="api-search-suggest"),
     # Admin CRUD
     path(
         "admin/songs/",
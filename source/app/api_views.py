@@ -1,19 +1,41 @@
 from django.contrib.auth.models import User
+from django.core.cache import caches
 
-from django.shortcuts import get_object_or_404
+from django.http import Http404, HttpResponse
+from django.shortcuts import get_object_or_404, redirect
+from django.utils.cache import get_conditional_response, patch_cache_control
 
 from rest_framework import status, generics
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import (
+    api_view,
+    permission_classes,
+    authentication_classes,
+    throttle_classes,
+)
 from rest_framework.permissions import IsAuthenticated, AllowAny, BasePermission
+from rest_framework.negotiation import BaseContentNegotiation
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.throttling import AnonRateThrottle
 
-from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView
 
-from .models import Song, Artist, Genre, Album
+from .authentication import RefreshToken
+from .models import Song, Artist, Genre, Album, SongRanking
+from .streaming import file_validators, stream_file
+from .hls import absolute_playlist
+from .search import search_songs as full_text_search
+from .suggest import suggest
+from .conditional import ConditionalGetMixin
+from .pagination import KeysetOrPageNumberMixin
+from .membership import add_members, remove_members, toggle_member
+from . import trending
+from .recommendations import similar_songs, recommended_songs
+from .routers import ReplicaReadMixin, reads_from_replica
 
 from .serializers import (
+    EMBEDDED_SONGS_LIMIT,
     SongSerializer,
     SongWriteSerializer,
     ArtistSerializer,
@@ -23,6 +45,10 @@ from .serializers import (
 )
 
 
+# Cache generations that change the payload of each resource
+SONG_NAMESPACES = ("songs", "genres", "favorite_counts")
+
+
 class IndexAPIView(APIView):
     permission_classes = [AllowAny]
 
@@ -81,22 +107,151 @@ class ProfileAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        serializer = UserSerializer(request.user)
+        serializer = UserSerializer(request.user, context={"request": request})
         
         return Response(serializer.data)
 
 
 # Songs
-class SongListAPIView(generics.ListAPIView):
-    queryset = Song.objects.all().order_by("-created_at")
+class SongListAPIView(
+    ReplicaReadMixin, ConditionalGetMixin, KeysetOrPageNumberMixin, generics.ListAPIView
+):
+    queryset = Song.objects.ready().with_related().order_by("-created_at", "-id")
+    serializer_class = SongSerializer
+    permission_classes = [AllowAny]
+    etag_namespaces = SONG_NAMESPACES
+
+
+class PopularSongListAPIView(ConditionalGetMixin, generics.ListAPIView):
+    # Most favorited, straight off the song_favorites_id_idx index
+    queryset = Song.objects.ready().with_related().order_by("-favorite_count", "-id")
+    serializer_class = SongSerializer
+    permission_classes = [AllowAny]
+    etag_namespaces = SONG_NAMESPACES
+
+
+class TrendingSongListAPIView(generics.ListAPIView):
+    # Reads the precomputed charts (`manage.py update_trending`)
     serializer_class = SongSerializer
     permission_classes = [AllowAny]
 
+    def get_queryset(self):
+        chart = self.request.query_params.get("chart", SongRanking.TRENDING)
+        if chart not in dict(SongRanking.CHART_CHOICES):
+            chart = SongRanking.TRENDING
+
+        return (
+            Song.objects.ready()
+            .with_related()
+            .filter(rankings__chart=chart)
+            .order_by("rankings__position")
+        )
+
+
+class PlayRateThrottle(AnonRateThrottle):
+    # Per client IP, counted in the cache shared by all workers
+    scope = "play"
+    cache = caches["throttling"]
+
+
+@api_view(["POST"])
+@permission_classes([AllowAny])
+@authentication_classes([])
+@throttle_classes([PlayRateThrottle])
+def song_play(request, pk):
+    # Counted in the shared cache and drained by update_trending, see app/trending.py
+    trending.buffer.record(pk, plays=1)
+
+    return Response(status=status.HTTP_202_ACCEPTED)
+
 
-class SongDetailAPIView(generics.RetrieveAPIView):
-    queryset = Song.objects.all()
+@api_view(["GET"])
+@permission_classes([AllowAny])
+def song_similar(request, pk):
+    # Precomputed top-k, one indexed query (+ genres prefetch)
+    songs = similar_songs(pk)
+    serializer = SongSerializer(songs, many=True, context={"request": request})
+
+    return Response(serializer.data)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def recommendations(request):
+    songs = recommended_songs(request.user)
+    serializer = SongSerializer(songs, many=True, context={"request": request})
+
+    return Response(serializer.data)
+
+
+class SongDetailAPIView(ConditionalGetMixin, generics.RetrieveAPIView):
+    queryset = Song.objects.with_related()
     serializer_class = SongSerializer
     permission_classes = [AllowAny]
+    # No Last-Modified: the payload embeds the artist and genres, which
+    # song.updated_at doesn't follow; the generation ETag does
+    etag_namespaces = SONG_NAMESPACES
+
+
+class IgnoreClientContentNegotiation(BaseContentNegotiation):
+    # Audio clients send `Accept: audio/*`, which no DRF renderer matches
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return (renderers[0], renderers[0].media_type)
+
+
+class SongStreamAPIView(APIView):
+    permission_classes = [AllowAny]
+    authentication_classes = []
+    content_negotiation_class = IgnoreClientContentNegotiation
+
+    def get(self, request, pk):
+        song = get_object_or_404(Song.objects.ready(), pk=pk)
+
+        return stream_file(request, song.audio_file)
+
+
+class SongWaveformAPIView(APIView):
+    # Peaks only change with the audio; serializers add ?v=<content hash>
+    permission_classes = [AllowAny]
+    authentication_classes = []
+    content_negotiation_class = IgnoreClientContentNegotiation
+    max_age = 365 * 24 * 60 * 60
+
+    def get(self, request, pk):
+        song = get_object_or_404(Song.objects.only("waveform"), pk=pk)
+        if not song.waveform:
+            raise Http404("Waveform not generated yet")
+
+        etag, modified = file_validators(song.waveform)
+        response = get_conditional_response(request, etag=etag, last_modified=modified)
+        if response is None:
+            response = stream_file(request, song.waveform)
+            response["Content-Type"] = "application/octet-stream"
+        patch_cache_control(response, public=True, max_age=self.max_age)
+
+        return response
+
+
+class SongPlaylistAPIView(APIView):
+    # HLS master playlist; falls back to the progressive MP3 until transcoded
+    permission_classes = [AllowAny]
+    authentication_classes = []
+    content_negotiation_class = IgnoreClientContentNegotiation
+    max_age = 5 * 60
+
+    def get(self, request, pk):
+        song = get_object_or_404(Song.objects.ready().only("audio_file", "hls_playlist"), pk=pk)
+        if not song.hls_playlist:
+            return redirect("api-song-stream", pk=pk)
+
+        body = absolute_playlist(song.audio_file.storage, song.hls_playlist, request)
+        response = HttpResponse(body, content_type="application/vnd.apple.mpegurl")
+        patch_cache_control(response, public=True, max_age=self.max_age)
+
+        return response
 
 
 class FavoriteSongListAPIView(generics.ListAPIView):
@@ -104,54 +259,51 @@ class FavoriteSongListAPIView(generics.ListAPIView):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return self.request.user.favorite_songs.all()
+        return self.request.user.favorite_songs.with_related().order_by("-id")
 
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
 def toggle_favorite(request, song_id):
     song = get_object_or_404(Song, id=song_id)
-    user = request.user
-
-    if song in user.favorite_songs.all():
-        user.favorite_songs.remove(song)
-        is_favorite = False
-    else:
-        user.favorite_songs.add(song)
-        is_favorite = True
+    is_favorite = toggle_member(request.user, "favorite_songs", song.id)
 
     return Response({"is_favorite": is_favorite})
 
 
 # Artists
-class ArtistListAPIView(generics.ListAPIView):
+class ArtistListAPIView(ConditionalGetMixin, generics.ListAPIView):
     queryset = Artist.objects.all()
     serializer_class = ArtistSerializer
     permission_classes = [AllowAny]
+    etag_namespaces = ("artists",)
 
 
-class ArtistDetailAPIView(generics.RetrieveAPIView):
+class ArtistDetailAPIView(ConditionalGetMixin, generics.RetrieveAPIView):
     queryset = Artist.objects.all()
     serializer_class = ArtistSerializer
     permission_classes = [AllowAny]
+    etag_namespaces = ("artists",)
 
 
 # GENRES
-class GenreListAPIView(generics.ListAPIView):
+class GenreListAPIView(ConditionalGetMixin, generics.ListAPIView):
     queryset = Genre.objects.all()
     serializer_class = GenreSerializer
     permission_classes = [AllowAny]
+    etag_namespaces = ("genres",)
 
 
-class GenreDetailAPIView(generics.RetrieveAPIView):
+class GenreDetailAPIView(ConditionalGetMixin, generics.RetrieveAPIView):
     queryset = Genre.objects.all()
     serializer_class = GenreSerializer
     permission_classes = [AllowAny]
+    etag_namespaces = ("genres",)
 
 
 # Albums
 class AlbumListAPIView(generics.ListCreateAPIView):
-    queryset = Album.objects.all()
+    queryset = Album.objects.with_song_preview(EMBEDDED_SONGS_LIMIT).order_by("-id")
     serializer_class = AlbumSerializer
     permission_classes = [IsAuthenticated]
 
@@ -164,7 +316,32 @@ class AlbumDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Album.objects.filter(user=self.request.user)
+        return (
+            Album.objects.filter(user=self.request.user)
+            .with_song_preview(EMBEDDED_SONGS_LIMIT)
+            .order_by("-created_at")
+        )
+
+
+class AlbumSongListAPIView(generics.ListAPIView):
+    serializer_class = SongSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_album(self):
+        return get_object_or_404(Album, id=self.kwargs["album_id"], user=self.request.user)
+
+    def get_queryset(self):
+        return self.get_album().songs.with_related().order_by("-id")
+
+    def post(self, request, album_id):
+        # Bulk add: {"song_ids": [1, 2, 3]}
+        song_ids = request.data.get("song_ids")
+        if not isinstance(song_ids, list) or not all(isinstance(i, int) for i in song_ids):
+            return Response({"error": "song_ids must be a list of ids"}, status=400)
+
+        added = add_members(self.get_album(), "songs", song_ids)
+
+        return Response({"added": sorted(added)}, status=status.HTTP_201_CREATED)
 
 
 @api_view(["POST"])
@@ -173,10 +350,9 @@ def album_add_song(request, album_id, song_id):
     album = get_object_or_404(Album, id=album_id, user=request.user)
     song = get_object_or_404(Song, id=song_id)
 
-    if song in album.songs.all():
+    if not add_members(album, "songs", [song.id]):
         return Response({"message": "Song already in album"}, status=400)
 
-    album.songs.add(song)
     return Response({"message": f"Song '{song.title}' added to album '{album.name}'"})
 
 
@@ -186,33 +362,58 @@ def album_remove_song(request, album_id, song_id):
     album = get_object_or_404(Album, id=album_id, user=request.user)
     song = get_object_or_404(Song, id=song_id)
 
-    if song not in album.songs.all():
+    if not remove_members(album, "songs", [song.id]):
         return Response({"message": "Song not in album"}, status=400)
 
-    album.songs.remove(song)
-
     return Response(
         {"message": f"Song '{song.title}' removed from album '{album.name}'"}
     )
 
 
 # Search
+@reads_from_replica
 @api_view(["GET"])
 def search_songs(request):
     query = request.GET.get("query", "")
     genre_id = request.GET.get("genre", "")
 
-    songs = Song.objects.all()
-
-    if query:
-        songs = songs.filter(title__icontains=query)
+    songs = Song.objects.ready().with_related()
 
     if genre_id:
         songs = songs.filter(genres__id=genre_id)
 
-    serializer = SongSerializer(songs, many=True)
+    if query:
+        songs = full_text_search(query, songs)
+    else:
+        songs = songs.order_by("-id")
 
-    return Response(serializer.data)
+    paginator = PageNumberPagination()
+    page = paginator.paginate_queryset(songs, request)
+    serializer = SongSerializer(page, many=True, context={"request": request})
+
+    return paginator.get_paginated_response(serializer.data)
+
+
+@api_view(["GET"])
+@permission_classes([AllowAny])
+@authentication_classes([])
+def search_suggest(request):
+    query = request.GET.get("q", "")
+    try:
+        limit = min(max(int(request.GET.get("limit", 5)), 1), 10)
+    except ValueError:
+        limit = 5
+
+    # Served from the in-memory prefix index, no database hit
+    results = suggest(query, limit)
+
+    return Response(
+        {
+            "songs": results["song"],
+            "artists": results["artist"],
+            "genres": results["genre"],
+        }
+    )
 
 
 ########################################
@@ -226,8 +427,8 @@ class IsAdmin(BasePermission):
 
 
 # SONG Admin CRUD
-class AdminSongListCreateAPIView(generics.ListCreateAPIView):
-    queryset = Song.objects.all().order_by("-created_at")
+class AdminSongListCreateAPIView(KeysetOrPageNumberMixin, generics.ListCreateAPIView):
+    queryset = Song.objects.with_related().order_by("-created_at", "-id")
     permission_classes = [IsAuthenticated, IsAdmin]
 
     def get_serializer_class(self):
@@ -239,9 +440,16 @@ class AdminSongListCreateAPIView(generics.ListCreateAPIView):
     def perform_create(self, serializer):
         serializer.save(uploaded_by=self.request.user)
 
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        # Upload processing continues on the job queue (app/tasks.py)
+        if response.data.get("status") == Song.PENDING:
+            response.status_code = status.HTTP_202_ACCEPTED
+        return response
+
 
 class AdminSongDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Song.objects.all()
+    queryset = Song.objects.with_related()
     permission_classes = [IsAuthenticated, IsAdmin]
 
     def get_serializer_class(self):
@@ -250,6 +458,13 @@ class AdminSongDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
 
         return SongSerializer
 
+    def update(self, request, *args, **kwargs):
+        response = super().update(request, *args, **kwargs)
+        # A new audio file is processed on the job queue
+        if response.data.get("status") == Song.PENDING:
+            response.status_code = status.HTTP_202_ACCEPTED
+        return response
+
 
 # ARTIST Admin CRUD
 class AdminArtistListCreateAPIView(generics.ListCreateAPIView):
@@ -0,0 +1,16 @@
+from django.urls import path
+
+from . import async_views
+
+
+# Served under /api/async/, meant for ASGI deployments (project/asgi.py)
+urlpatterns = [
+    path("songs/", async_views.song_list, name="api-async-song-list"),
+    path("songs/<int:pk>/", async_views.song_detail, name="api-async-song-detail"),
+    path("songs/<int:pk>/stream/", async_views.song_stream, name="api-async-song-stream"),
+    path("search/", async_views.search_songs, name="api-async-search"),
+    path("artists/", async_views.artist_list, name="api-async-artist-list"),
+    path("artists/<int:pk>/", async_views.artist_detail, name="api-async-artist-detail"),
+    path("genres/", async_views.genre_list, name="api-async-genre-list"),
+    path("genres/<int:pk>/", async_views.genre_detail, name="api-async-genre-detail"),
+]
@@ -0,0 +1,222 @@
+"""
+Async-native versions of the hot public read endpoints, for ASGI servers
+(uvicorn). They use the async ORM (aiterator / aget / acount) and return the
+same payloads as their DRF counterparts in app/api_views.py, which stay the
+reference implementation (browsable API, schema, writes).
+
+Serializers only run on rows fetched with their related objects
+(Song.objects.with_related()), so they never touch the database from the
+event loop.
+"""
+
+from functools import wraps
+
+from django.contrib.auth.models import User
+from django.http import Http404, JsonResponse
+from django.utils.cache import get_conditional_response
+from django.views.decorators.http import require_GET
+
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from .api_views import SONG_NAMESPACES
+from .authentication import CachedJWTAuthentication
+from .conditional import generation_etag
+from .models import Song, Artist, Genre
+from .pagination import after_cursor, decode_cursor, encode_cursor
+from .routers import reads_from_replica
+from .search import search_songs as full_text_search
+from .serializers import SongSerializer, ArtistSerializer, GenreSerializer
+from .streaming import stream_file
+
+
+PAGE_SIZE = api_settings.PAGE_SIZE
+
+
+def detail(message, status):
+    return JsonResponse({"detail": message}, status=status)
+
+
+async def fetch(queryset, limit):
+    return [obj async for obj in queryset[:limit].aiterator(chunk_size=limit)]
+
+
+async def jwt_user(request):
+    """The active user of a valid `Authorization: Bearer` access token, or None."""
+    authenticator = CachedJWTAuthentication()
+    header = authenticator.get_header(request)
+    raw_token = authenticator.get_raw_token(header) if header else None
+    if raw_token is None:
+        return None
+
+    try:
+        token = authenticator.get_validated_token(raw_token)
+    except (InvalidToken, TokenError):
+        return None
+
+    return await User.objects.filter(
+        **{jwt_settings.USER_ID_FIELD: token.get(jwt_settings.USER_ID_CLAIM)}, is_active=True
+    ).afirst()
+
+
+async def numbered_page(request, queryset, serializer_class):
+    """PageNumberPagination's payload, with an async COUNT and fetch."""
+    try:
+        number = int(request.GET.get("page", 1))
+        if number < 1:
+            raise ValueError
+    except ValueError:
+        raise Http404("Invalid page.")
+
+    count = await queryset.acount()
+    start = (number - 1) * PAGE_SIZE
+    if start and start >= count:
+        raise Http404("Invalid page.")
+    rows = await fetch(queryset[start:], PAGE_SIZE)
+
+    url = request.build_absolute_uri()
+    next_url = replace_query_param(url, "page", number + 1) if start + PAGE_SIZE < count else None
+    if number == 1:
+        previous_url = None
+    elif number == 2:
+        previous_url = remove_query_param(url, "page")
+    else:
+        previous_url = replace_query_param(url, "page", number - 1)
+
+    return {
+        "count": count,
+        "next": next_url,
+        "previous": previous_url,
+        "results": serializer_class(rows, many=True, context={"request": request}).data,
+    }
+
+
+def conditional(namespaces):
+    """ConditionalGetMixin for async function views: 304 on a matching ETag."""
+
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            etag = generation_etag(request, namespaces)
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                try:
+                    response = await view(request, *args, **kwargs)
+                except Http404 as exc:
+                    response = detail(str(exc) or "Not found.", 404)
+            if etag is not None:
+                response["ETag"] = etag
+
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+# Songs
+@require_GET
+@reads_from_replica
+@conditional(SONG_NAMESPACES)
+async def song_list(request):
+    """Keyset pages, like SongListAPIView with `?cursor=`."""
+    cursor = request.GET.get("cursor")
+    try:
+        cursor = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise Http404("Invalid cursor")
+
+    rows = await fetch(after_cursor(Song.objects.ready().with_related(), cursor), PAGE_SIZE + 1)
+    next_url = None
+    if len(rows) > PAGE_SIZE:
+        rows = rows[:PAGE_SIZE]
+        next_url = replace_query_param(request.build_absolute_uri(), "cursor", encode_cursor(rows[-1]))
+
+    serializer = SongSerializer(rows, many=True, context={"request": request})
+
+    return JsonResponse({"next": next_url, "results": serializer.data})
+
+
+@require_GET
+@conditional(SONG_NAMESPACES)
+async def song_detail(request, pk):
+    # No Last-Modified, like SongDetailAPIView: the payload embeds the artist
+    # and genres, whose changes don't touch Song.updated_at
+    try:
+        song = await Song.objects.with_related().aget(pk=pk)
+    except Song.DoesNotExist:
+        return detail("No Song matches the given query.", 404)
+
+    return JsonResponse(SongSerializer(song, context={"request": request}).data)
+
+
+@require_GET
+async def song_stream(request, pk):
+    try:
+        song = await Song.objects.ready().only("audio_file").aget(pk=pk)
+    except Song.DoesNotExist:
+        return detail("No Song matches the given query.", 404)
+
+    return stream_file(request, song.audio_file, asynchronous=True)
+
+
+# Search
+@require_GET
+@reads_from_replica
+async def search_songs(request):
+    if await jwt_user(request) is None:
+        return detail("Authentication credentials were not provided.", 401)
+
+    query = request.GET.get("query", "")
+    genre_id = request.GET.get("genre", "")
+
+    songs = Song.objects.ready().with_related()
+    if genre_id:
+        songs = songs.filter(genres__id=genre_id)
+    if query:
+        songs = full_text_search(query, songs)
+    else:
+        songs = songs.order_by("-id")
+
+    try:
+        return JsonResponse(await numbered_page(request, songs, SongSerializer))
+    except Http404 as exc:
+        return detail(str(exc), 404)
+
+
+# Artists
+@require_GET
+@conditional(("artists",))
+async def artist_list(request):
+    return JsonResponse(await numbered_page(request, Artist.objects.order_by("pk"), ArtistSerializer))
+
+
+@require_GET
+@conditional(("artists",))
+async def artist_detail(request, pk):
+    try:
+        artist = await Artist.objects.aget(pk=pk)
+    except Artist.DoesNotExist:
+        return detail("No Artist matches the given query.", 404)
+
+    return JsonResponse(ArtistSerializer(artist, context={"request": request}).data)
+
+
+# Genres
+@require_GET
+@conditional(("genres",))
+async def genre_list(request):
+    return JsonResponse(await numbered_page(request, Genre.objects.order_by("pk"), GenreSerializer))
+
+
+@require_GET
+@conditional(("genres",))
+async def genre_detail(request, pk):
+    try:
+        genre = await Genre.objects.aget(pk=pk)
+    except Genre.DoesNotExist:
+        return detail("No Genre matches the given query.", 404)
+
+    return JsonResponse(GenreSerializer(genre).data)
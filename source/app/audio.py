@@ -0,0 +1,226 @@
+"""
+Streaming MP3 inspection: ID3v2 skip, first MPEG frame header, Xing/Info/VBRI
+VBR headers and an ID3v1 tag check. Only a few KB are read for the header;
+the content hash is computed in CHUNK_SIZE pieces.
+
+decode_pcm() streams decoded samples from ffmpeg for the offline analyses
+(waveform peaks, loudness).
+"""
+
+import hashlib
+import struct
+import subprocess
+import tempfile
+import threading
+
+from django.conf import settings
+
+
+CHUNK_SIZE = 64 * 1024
+
+# ffmpeg is killed when a decode takes longer than this (seconds)
+DECODE_TIMEOUT = 600
+
+# How far past the ID3 tag to look for the first frame sync
+SYNC_SEARCH = 64 * 1024
+
+# kbps by [version is MPEG1][layer]
+BITRATES = {
+    (True, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (True, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (True, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (False, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (False, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (False, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+
+# Hz by version bits (0: MPEG2.5, 2: MPEG2, 3: MPEG1)
+SAMPLE_RATES = {
+    0: [11025, 12000, 8000],
+    2: [22050, 24000, 16000],
+    3: [44100, 48000, 32000],
+}
+
+
+class InvalidAudio(ValueError):
+    pass
+
+
+def parse_frame_header(header):
+    """Decode a 4-byte MPEG audio frame header, or return None."""
+    (value,) = struct.unpack(">I", header)
+    if value >> 21 != 0x7FF:
+        return None
+
+    version = (value >> 19) & 0x3
+    layer = 4 - ((value >> 17) & 0x3)
+    bitrate_index = (value >> 12) & 0xF
+    rate_index = (value >> 10) & 0x3
+    if version == 1 or layer == 4 or bitrate_index in (0, 15) or rate_index == 3:
+        # Reserved values (and free format, which we don't support)
+        return None
+
+    mpeg1 = version == 3
+    sample_rate = SAMPLE_RATES[version][rate_index]
+    bitrate = BITRATES[(mpeg1, layer)][bitrate_index]
+    if layer == 1:
+        samples = 384
+    elif layer == 2 or mpeg1:
+        samples = 1152
+    else:
+        samples = 576
+
+    return {
+        "mpeg1": mpeg1,
+        "layer": layer,
+        "bitrate": bitrate,
+        "sample_rate": sample_rate,
+        "samples": samples,
+        "mono": (value >> 6) & 0x3 == 3,
+        "length": frame_length(layer, samples, bitrate, sample_rate, (value >> 9) & 0x1),
+    }
+
+
+def frame_length(layer, samples, bitrate, sample_rate, padding):
+    if layer == 1:
+        return (12 * bitrate * 1000 // sample_rate + padding) * 4
+
+    return samples // 8 * bitrate * 1000 // sample_rate + padding
+
+
+def id3v2_size(head):
+    if head[:3] != b"ID3" or len(head) < 10:
+        return 0
+
+    size = 0
+    for byte in head[6:10]:
+        size = (size << 7) | (byte & 0x7F)
+    footer = 10 if head[5] & 0x10 else 0
+
+    return 10 + size + footer
+
+
+def vbr_frames(frame, info):
+    """Frame count from a Xing/Info or VBRI header inside the first frame."""
+    if info["mpeg1"]:
+        offset = 4 + (17 if info["mono"] else 32)
+    else:
+        offset = 4 + (9 if info["mono"] else 17)
+
+    tag = frame[offset : offset + 4]
+    if tag in (b"Xing", b"Info"):
+        flags = struct.unpack(">I", frame[offset + 4 : offset + 8])[0]
+        if flags & 0x1:
+            return struct.unpack(">I", frame[offset + 8 : offset + 12])[0]
+
+    if frame[36:40] == b"VBRI":
+        return struct.unpack(">I", frame[50:54])[0]
+
+    return None
+
+
+def read_audio_metadata(f):
+    """
+    Inspect an MP3 file object (left rewound) and return a dict with
+    duration (s), bitrate (kbps), sample_rate (Hz), file_size and
+    content_hash (sha256). Raises InvalidAudio when no MPEG frame is found.
+    """
+    f.seek(0, 2)
+    size = f.tell()
+
+    f.seek(0)
+    start = id3v2_size(f.read(10))
+    f.seek(start)
+    window = f.read(SYNC_SEARCH)
+
+    info = None
+    for position in range(len(window) - 3):
+        if window[position] == 0xFF and window[position + 1] & 0xE0 == 0xE0:
+            info = parse_frame_header(window[position : position + 4])
+            if info is None:
+                continue
+
+            # A real frame is followed by another one (or the end of the file)
+            following = window[position + info["length"] : position + info["length"] + 4]
+            if len(following) == 4 and not parse_frame_header(following):
+                info = None
+                continue
+
+            start += position
+            window = window[position:]
+            break
+    if info is None:
+        raise InvalidAudio("No MPEG audio frame found")
+
+    f.seek(max(size - 128, 0))
+    audio_end = size - 128 if f.read(3) == b"TAG" else size
+
+    frames = vbr_frames(window[:200], info)
+    if frames:
+        duration = frames * info["samples"] / info["sample_rate"]
+        bitrate = round((audio_end - start) * 8 / duration / 1000) if duration else info["bitrate"]
+    else:
+        bitrate = info["bitrate"]
+        duration = (audio_end - start) * 8 / (bitrate * 1000)
+
+    digest = hashlib.sha256()
+    f.seek(0)
+    for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+        digest.update(chunk)
+    f.seek(0)
+
+    return {
+        "duration": round(duration, 3),
+        "bitrate": bitrate,
+        "sample_rate": info["sample_rate"],
+        "file_size": size,
+        "content_hash": digest.hexdigest(),
+    }
+
+
+def ffmpeg_binary():
+    return getattr(settings, "FFMPEG_BINARY", "ffmpeg")
+
+
+def decode_pcm(path, sample_rate, channels=1, read_size=CHUNK_SIZE, timeout=DECODE_TIMEOUT):
+    """
+    Yield interleaved little-endian int16 PCM from ffmpeg, `read_size` bytes
+    at a time; ffmpeg is killed after `timeout` seconds.
+    """
+    # Errors go to a file, not a pipe: a corrupt upload can log more than a
+    # pipe buffer while we only read stdout, which would block both processes
+    with tempfile.TemporaryFile() as errors:
+        process = subprocess.Popen(
+            [
+                ffmpeg_binary(),
+                "-v", "error",
+                "-i", path,
+                "-ac", str(channels),
+                "-ar", str(sample_rate),
+                "-f", "s16le",
+                "-",
+            ],
+            stdout=subprocess.PIPE,
+            stderr=errors,
+        )
+        expired = threading.Event()
+
+        def kill():
+            expired.set()
+            process.kill()
+
+        timer = threading.Timer(timeout, kill)
+        timer.start()
+        try:
+            for chunk in iter(lambda: process.stdout.read(read_size), b""):
+                yield chunk
+        finally:
+            timer.cancel()
+            process.stdout.close()
+            returncode = process.wait()
+            if expired.is_set():
+                raise RuntimeError(f"ffmpeg timed out after {timeout}s")
+            if returncode != 0:
+                errors.seek(0)
+                error = errors.read(64 * 1024).decode(errors="replace")
+                raise RuntimeError(f"ffmpeg failed: {error.strip()}")
@@ -0,0 +1,166 @@
+"""
+JWT authentication without a query per API request.
+
+CachedJWTAuthentication trusts an already decoded access token for
+TOKEN_TRUST_TTL seconds (per worker) and reads the User row through the
+shared querysets cache; app/signals.py drops that entry when the user is
+saved or deleted. The entry holds the row without its password hash, and
+it is skipped when the querysets cache is process-local, since the drop
+would only reach one worker.
+
+Refresh tokens check the blacklist against a per-worker Bloom filter first,
+so only a possible hit queries the BlacklistedToken table. Workers learn
+about new blacklist rows through the "blacklist" cache generation, bumped
+once the row is committed; without a shared default cache they can't, and
+every refresh checks the table as simplejwt does.
+"""
+
+import threading
+import time
+from datetime import timedelta
+
+from django.core.cache import caches
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt import tokens
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .bloom import BloomFilter
+from .caching import LocalLRU, get_or_set, get_version, is_shared
+
+
+# How long a decoded access token is reused without verifying it again
+TOKEN_TRUST_TTL = 30
+# How long a user row may be served from the cache (also dropped on save)
+USER_CACHE_TTL = 300
+# Blacklisted tokens per Bloom filter before it is rebuilt from the table
+BLACKLIST_CAPACITY = 100_000
+# Catch-up reloads re-read rows blacklisted this long before the previous
+# load, for transactions that committed late and clock skew between workers
+BLACKLIST_OVERLAP = timedelta(minutes=5)
+
+validated_tokens = LocalLRU(maxsize=1024)
+
+
+def user_cache_key(user_id):
+    return f"jwt-user:{user_id}"
+
+
+def forget_user(user_id):
+    caches["querysets"].delete(user_cache_key(user_id))
+
+
+def user_row(user):
+    """Picklable copy of `user` for the cache: no password, only its revoke claim."""
+    fields = [f for f in user._meta.concrete_fields if f.attname != "password"]
+    revoke_hash = get_md5_hash_password(user.password) if api_settings.CHECK_REVOKE_TOKEN else None
+
+    return (
+        user._state.db,
+        [f.attname for f in fields],
+        [getattr(user, f.attname) for f in fields],
+        revoke_hash,
+    )
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_validated_token(self, raw_token):
+        now = time.time()
+        entry = validated_tokens.get(raw_token)
+        if entry is not None and now < entry[1]:
+            return entry[0]
+
+        token = super().get_validated_token(raw_token)
+        validated_tokens.set(raw_token, (token, min(now + TOKEN_TRUST_TTL, token["exp"])))
+
+        return token
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        def load():
+            user = self.user_model.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).first()
+            return None if user is None else user_row(user)
+
+        if is_shared("querysets"):
+            row = get_or_set(user_cache_key(user_id), load, USER_CACHE_TTL)
+        else:
+            row = load()
+        if row is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        db, names, values, revoke_hash = row
+        # The password stays deferred: read (and saved) only if a view needs it
+        user = self.user_model.from_db(db, names, values)
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != revoke_hash:
+            raise AuthenticationFailed(
+                _("The user's password has been changed."), code="password_changed"
+            )
+
+        return user
+
+
+class BlacklistFilter:
+    """Bloom filter of blacklisted jtis, caught up incrementally by blacklisted_at."""
+
+    def __init__(self, capacity=BLACKLIST_CAPACITY):
+        self.capacity = capacity
+        self.lock = threading.Lock()
+        self.bloom = None
+        self.version = None
+        self.loaded_at = None
+
+    def refresh(self):
+        version = get_version("blacklist")
+        if version == self.version:
+            return
+
+        with self.lock:
+            if version == self.version:
+                return
+
+            started_at = timezone.now()
+            rows = BlacklistedToken.objects.all()
+            if self.bloom is None or self.bloom.full:
+                # Rebuild without the tokens that can't be presented any more
+                self.bloom = BloomFilter(self.capacity)
+                rows = rows.filter(token__expires_at__gt=started_at)
+            else:
+                # Not by pk: a lower pk can commit after a higher one was loaded
+                rows = rows.filter(blacklisted_at__gte=self.loaded_at - BLACKLIST_OVERLAP)
+
+            for jti in rows.values_list("token__jti", flat=True).iterator():
+                # Rows of the overlap are seen twice; count them once
+                if jti not in self.bloom:
+                    self.bloom.add(jti)
+            self.version = version
+            self.loaded_at = started_at
+
+    def might_contain(self, jti):
+        self.refresh()
+
+        return jti in self.bloom
+
+
+blacklist_filter = BlacklistFilter()
+
+
+class RefreshToken(tokens.RefreshToken):
+    def check_blacklist(self):
+        # The filter only hears about other workers' rows through a shared cache
+        if not is_shared() or blacklist_filter.might_contain(self.payload[api_settings.JTI_CLAIM]):
+            super().check_blacklist()
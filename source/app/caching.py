@@ -0,0 +1,169 @@
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache, caches
+
+
+# How long a worker trusts its local copy before re-checking the version
+LOCAL_TTL = 5
+
+# Timeouts are stretched by up to this fraction so keys set together
+# don't all expire together
+TTL_JITTER = 0.1
+# A loader holding the recompute lock longer than this is presumed dead;
+# kept well under the request timeout so waiters still answer in time
+LOCK_TIMEOUT = 10
+# How often waiters re-check the cache while another worker recomputes
+LOCK_POLL = 0.05
+# cached_versioned entries expire even if their version is never bumped
+VERSIONED_TIMEOUT = 3600
+
+MISSING = object()
+
+
+class LocalLRU:
+    """Small thread-safe, process-local LRU."""
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.data:
+                return None
+            self.data.move_to_end(key)
+            return self.data[key]
+
+    def set(self, key, value):
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def discard(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+
+local_cache = LocalLRU()
+
+
+def is_shared(using="default"):
+    """False for process-local backends, whose keys other workers never see."""
+    backend = settings.CACHES[using]["BACKEND"]
+
+    return not backend.endswith((".LocMemCache", ".DummyCache"))
+
+
+def version_key(namespace):
+    return f"version:{namespace}"
+
+
+def fresh_version():
+    # A lost version key (eviction, cache restart) must never be re-seeded
+    # with a value already used, or entries and ETags of that version return
+    return time.time_ns() // 1000
+
+
+def get_version(namespace):
+    version = cache.get(version_key(namespace))
+    if version is None:
+        seed = fresh_version()
+        cache.add(version_key(namespace), seed, None)
+        version = cache.get(version_key(namespace), seed)
+
+    return version
+
+
+def bump_version(namespace):
+    """Invalidate every key of `namespace` in all workers."""
+    try:
+        cache.incr(version_key(namespace))
+    except ValueError:
+        cache.set(version_key(namespace), fresh_version(), None)
+
+    local_cache.discard(namespace)
+
+
+def jittered(timeout, jitter=TTL_JITTER):
+    if not timeout:
+        return timeout
+
+    return int(timeout * (1 + random.uniform(0, jitter)))
+
+
+def get_or_set(key, loader, timeout=None, using="querysets", lock_timeout=LOCK_TIMEOUT):
+    """
+    Return the cached value of `key`, computing it with `loader()` on a miss.
+
+    Only the worker that wins the `lock:<key>` add() runs the loader; the
+    others poll until the value appears, retrying the lock meanwhile so one
+    of them takes over if the loader failed, and load it themselves after
+    `lock_timeout` seconds. `timeout` gets TTL_JITTER.
+    """
+    store = caches[using]
+    value = store.get(key, MISSING)
+    if value is not MISSING:
+        return value
+
+    lock = f"lock:{key}"
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + lock_timeout
+    while True:
+        if store.add(lock, token, lock_timeout):
+            try:
+                value = loader()
+                store.set(key, value, jittered(timeout))
+            finally:
+                release(store, lock, token)
+            return value
+
+        if time.monotonic() >= deadline:
+            return loader()
+
+        time.sleep(LOCK_POLL)
+        value = store.get(key, MISSING)
+        if value is not MISSING:
+            return value
+
+
+def release(store, lock, token):
+    # Don't drop a lock that expired and was taken by another worker since;
+    # the cache API has no compare-and-delete, so this only narrows the race
+    if store.get(lock) == token:
+        store.delete(lock)
+
+
+def cached_versioned(namespace, loader, timeout=VERSIONED_TIMEOUT):
+    """
+    Return `loader()` cached under the current version of `namespace`.
+
+    Lookups go local LRU -> shared cache -> loader; the shared version is
+    re-checked at most every LOCAL_TTL seconds per worker.
+    """
+    now = time.monotonic()
+    entry = local_cache.get(namespace)
+    if entry is not None and now - entry[2] < LOCAL_TTL:
+        return entry[1]
+
+    version = get_version(namespace)
+    if entry is not None and entry[0] == version:
+        local_cache.set(namespace, (version, entry[1], now))
+        return entry[1]
+
+    value = get_or_set(f"{namespace}:v{version}", loader, timeout)
+
+    local_cache.set(namespace, (version, value, now))
+
+    return value
@@ -0,0 +1,58 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .caching import get_version, is_shared
+
+
+def generation_etag(request, namespaces, format="json"):
+    """
+    Weak ETag for a URL from the cache generations of `namespaces`, or None
+    when the default cache is process-local: a bump would only reach the
+    worker that made it, and the others would keep answering 304.
+    """
+    if not is_shared():
+        return None
+
+    versions = ",".join(str(get_version(namespace)) for namespace in namespaces)
+    source = f"{request.get_full_path()}|{format}|{versions}"
+
+    return 'W/"%s"' % hashlib.md5(source.encode(), usedforsecurity=False).hexdigest()
+
+
+class ConditionalGetMixin:
+    """
+    Weak ETag / Last-Modified handling for read-only API views.
+
+    The ETag is derived from the cache generations in `etag_namespaces`
+    (bumped by model signals, see app/signals.py), so a matching
+    `If-None-Match` is answered with 304 before any query or serialization.
+    Without a shared cache there is no ETag and every request is served.
+    """
+
+    etag_namespaces = ()
+
+    def get_etag(self, request, *args, **kwargs):
+        return generation_etag(request, self.etag_namespaces, request.accepted_renderer.format)
+
+    def get_last_modified(self, request, *args, **kwargs):
+        """Unix timestamp for `Last-Modified`, or None."""
+        return None
+
+    def get(self, request, *args, **kwargs):
+        etag = self.get_etag(request, *args, **kwargs)
+        last_modified = self.get_last_modified(request, *args, **kwargs)
+
+        response = get_conditional_response(
+            request._request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+
+        if etag is not None:
+            response["ETag"] = etag
+        if last_modified is not None:
+            response["Last-Modified"] = http_date(last_modified)
+
+        return response
@@ -1,8 +1,26 @@
-from .models import Genre, Artist
+from django.utils.functional import SimpleLazyObject
+
+from .caching import cached_versioned
+from .models import Genre
+
+
+def cached_genres():
+    # Invalidated by the Genre save/delete signals
+    return cached_versioned("genres", lambda: list(Genre.objects.all()))
+
+
+def favorite_song_ids(request):
+    if not request.user.is_authenticated:
+        return set()
+
+    return set(request.user.favorite_songs.values_list("id", flat=True))
 
 
 # Global data
 def global_data(request):
     return {
-        "genres": Genre.objects.all(),
+        # Lazy: pages that never render `genres` don't touch any cache
+        "genres": SimpleLazyObject(cached_genres),
+        # One query per page for every Like/Liked button
+        "favorite_song_ids": SimpleLazyObject(lambda: favorite_song_ids(request)),
     }
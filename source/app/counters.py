@@ -0,0 +1,46 @@
+from django.contrib.auth.models import User
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Song, Album, Artist
+
+
+# (model, counter field, rows counted, FK from those rows to the model)
+COUNTERS = [
+    (Song, "favorite_count", User.favorite_songs.through, "song"),
+    (Album, "song_count", Album.songs.through, "album"),
+    (Artist, "song_count", Song, "artist"),
+]
+
+
+def adjust(model, pks, field, delta):
+    """Atomic `field = field + delta` for the given rows."""
+    pks = [pk for pk in pks or () if pk is not None]
+    if pks and delta:
+        model.objects.filter(pk__in=pks).update(**{field: F(field) + delta})
+
+
+def actual_count(related, fk):
+    counts = (
+        related.objects.filter(**{fk: OuterRef("pk")})
+        .order_by()
+        .values(fk)
+        .annotate(total=Count("*"))
+        .values("total")
+    )
+
+    return Coalesce(Subquery(counts), 0)
+
+
+def repair(model, field, related, fk, pks):
+    """Recount the drifted rows among `pks`; returns how many were fixed."""
+    drifted = list(
+        model.objects.filter(pk__in=pks)
+        .annotate(actual=actual_count(related, fk))
+        .exclude(**{field: F("actual")})
+        .values_list("pk", flat=True)
+    )
+    if drifted:
+        model.objects.filter(pk__in=drifted).update(**{field: actual_count(related, fk)})
+
+    return len(drifted)
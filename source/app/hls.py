@@ -0,0 +1,109 @@
+"""
+HLS renditions of a song for clients on slow connections.
+
+The worker encodes an AAC ladder (LADDER kbps, capped at the source
+bitrate) with the local ffmpeg into a temporary directory, then copies the
+playlists and segments into media storage under
+hls/<song id>/<content hash>/. The master playlist is written last, so its
+presence means the set is complete; the path changes with the audio, which
+lets the segments be cached as immutable.
+"""
+
+import os
+import subprocess
+import tempfile
+
+from django.core.files import File
+
+from .audio import ffmpeg_binary
+from .images import content_hash
+
+
+LADDER = [64, 128, 256]
+SEGMENT_SECONDS = 6
+MASTER = "master.m3u8"
+
+
+def rendition_command(source, kbps, out_dir):
+    return [
+        ffmpeg_binary(),
+        "-v", "error",
+        "-i", source,
+        # MP3s often carry the cover as a video stream
+        "-vn",
+        "-c:a", "aac",
+        "-b:a", f"{kbps}k",
+        "-f", "hls",
+        "-hls_time", str(SEGMENT_SECONDS),
+        "-hls_playlist_type", "vod",
+        "-hls_segment_filename", os.path.join(out_dir, "%03d.ts"),
+        os.path.join(out_dir, "index.m3u8"),
+    ]
+
+
+def master_playlist(bitrates):
+    lines = ["#EXTM3U", "#EXT-X-VERSION:3"]
+    for kbps in bitrates:
+        lines.append(f'#EXT-X-STREAM-INF:BANDWIDTH={kbps * 1000},CODECS="mp4a.40.2"')
+        lines.append(f"{kbps}k/index.m3u8")
+
+    return "\n".join(lines) + "\n"
+
+
+def delete_tree(storage, path):
+    directories, files = storage.listdir(path)
+    for name in files:
+        storage.delete(f"{path}/{name}")
+    for name in directories:
+        delete_tree(storage, f"{path}/{name}")
+
+
+def transcode(song):
+    """Encode the ladder into storage (unless already there); returns the master playlist name."""
+    storage = song.audio_file.storage
+    digest = song.content_hash or content_hash(song.audio_file)
+    base = f"hls/{song.pk}/{digest[:16]}"
+    master = f"{base}/{MASTER}"
+    if storage.exists(master):
+        return master
+
+    # Never upscale: keep the renditions at or below the source bitrate
+    bitrates = [kbps for kbps in LADDER if not song.bitrate or kbps <= song.bitrate] or LADDER[:1]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for kbps in bitrates:
+            out_dir = os.path.join(tmp, f"{kbps}k")
+            os.makedirs(out_dir)
+            subprocess.run(
+                rendition_command(song.audio_file.path, kbps, out_dir),
+                check=True,
+                capture_output=True,
+            )
+
+        if storage.exists(base):
+            # Leftovers of an interrupted run would get renamed copies
+            delete_tree(storage, base)
+        for kbps in bitrates:
+            for name in sorted(os.listdir(os.path.join(tmp, f"{kbps}k"))):
+                with open(os.path.join(tmp, f"{kbps}k", name), "rb") as f:
+                    storage.save(f"{base}/{kbps}k/{name}", File(f))
+
+    with tempfile.TemporaryFile() as f:
+        f.write(master_playlist(bitrates).encode())
+        f.seek(0)
+        storage.save(master, File(f))
+
+    return master
+
+
+def absolute_playlist(storage, master, request):
+    """The master playlist with rendition URIs pointing at media storage."""
+    base = os.path.dirname(master)
+    with storage.open(master, "rb") as f:
+        lines = f.read().decode().splitlines()
+
+    for i, line in enumerate(lines):
+        if line and not line.startswith("#"):
+            lines[i] = request.build_absolute_uri(storage.url(f"{base}/{line}"))
+
+    return "\n".join(lines) + "\n"
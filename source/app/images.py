@@ -0,0 +1,139 @@
+"""
+Responsive variants of uploaded images (Song.cover_image, Artist.image).
+
+Every size is written in each available format next to the original, under
+<upload dir>/variants/<content hash>/<size>.<ext>. The content hash makes
+generation idempotent: re-saving a model, or uploading the same picture
+again, reuses the files that already exist instead of re-encoding them.
+"""
+
+import hashlib
+import io
+import posixpath
+
+from django.core.files.base import ContentFile
+
+
+# Longest side in pixels, images are never upscaled
+SIZES = {"thumb": 160, "medium": 480, "large": 1024}
+
+# (extension, Pillow format, MIME type), best first; JPEG is the fallback
+FORMATS = [
+    ("avif", "AVIF", "image/avif"),
+    ("webp", "WEBP", "image/webp"),
+    ("jpg", "JPEG", "image/jpeg"),
+]
+QUALITY = {"AVIF": 50, "WEBP": 75, "JPEG": 80}
+
+# model name -> (image field, variants field)
+IMAGE_FIELDS = {
+    "song": ("cover_image", "cover_variants"),
+    "artist": ("image", "image_variants"),
+}
+
+# EXIF orientations that swap width and height
+TRANSPOSED = {5, 6, 7, 8}
+
+
+def available_formats():
+    from PIL import features
+
+    # AVIF needs a Pillow built with libavif
+    return [f for f in FORMATS if f[1] == "JPEG" or features.check(f[0])]
+
+
+def content_hash(field_file):
+    digest = hashlib.sha256()
+    with field_file.open("rb") as f:
+        for chunk in f.chunks():
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def scaled_widths(image):
+    """{size: width} for the distinct variant widths of a (lazily opened) image."""
+    width, height = image.size
+    if image.getexif().get(0x0112) in TRANSPOSED:
+        width, height = height, width
+
+    widths = {}
+    for size, longest in SIZES.items():
+        scaled = round(width * min(1, longest / max(width, height)))
+        if scaled not in widths.values():
+            widths[size] = scaled
+
+    return widths
+
+
+def encode(image, longest, pil_format):
+    from PIL import Image
+
+    resized = image.copy()
+    resized.thumbnail((longest, longest), Image.LANCZOS)
+    if pil_format == "JPEG" and resized.mode != "RGB":
+        background = Image.new("RGB", resized.size, "white")
+        background.paste(resized, mask=resized.getchannel("A") if "A" in resized.getbands() else None)
+        resized = background
+
+    out = io.BytesIO()
+    resized.save(out, pil_format, quality=QUALITY[pil_format])
+
+    return out.getvalue()
+
+
+def generate_variants(field_file):
+    """
+    Write the missing variants of `field_file` and return the map stored on
+    the model (see srcset_map).
+    """
+    from PIL import Image, ImageOps
+
+    storage = field_file.storage
+    digest = content_hash(field_file)
+    base = posixpath.join(posixpath.dirname(field_file.name), "variants", digest[:16])
+    formats = available_formats()
+
+    with field_file.open("rb") as f:
+        image = Image.open(f)
+        widths = scaled_widths(image)
+
+        pending = [
+            (size, ext, pil_format)
+            for size in widths
+            for ext, pil_format, _ in formats
+            if not storage.exists(f"{base}/{size}.{ext}")
+        ]
+        if pending:
+            image = ImageOps.exif_transpose(image)
+            image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+            for size, ext, pil_format in pending:
+                data = encode(image, SIZES[size], pil_format)
+                storage.save(f"{base}/{size}.{ext}", ContentFile(data))
+
+    return {
+        "source": field_file.name,
+        "hash": digest,
+        "base": base,
+        "widths": widths,
+        "formats": [ext for ext, _, _ in formats],
+    }
+
+
+def srcset_map(field_file, variants, request=None):
+    """{MIME type: "url 160w, url 480w, ..."} or None while variants are missing/stale."""
+    if not field_file or variants.get("source") != field_file.name:
+        return None
+
+    mime_types = {ext: mime for ext, _, mime in FORMATS}
+    result = {}
+    for ext in variants["formats"]:
+        candidates = []
+        for size, width in variants["widths"].items():
+            url = field_file.storage.url(f"{variants['base']}/{size}.{ext}")
+            if request is not None:
+                url = request.build_absolute_uri(url)
+            candidates.append(f"{url} {width}w")
+        result[mime_types[ext]] = ", ".join(candidates)
+
+    return result
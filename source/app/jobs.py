@@ -0,0 +1,180 @@
+"""
+Database-backed background jobs.
+
+Tasks are plain functions registered with @task. enqueue() inserts a Job row
+inside the caller's transaction, so a worker only sees it once the upload has
+been committed. `manage.py runworker` claims due jobs with a conditional
+UPDATE (safe for several processes on any database backend) and retries
+failures with exponential backoff; jobs that succeed are deleted, jobs that
+run out of attempts stay as "failed" with their traceback.
+
+With settings.JOBS_EAGER the task runs inline instead (tests, local dev).
+"""
+
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+
+logger = logging.getLogger(__name__)
+
+# Retry n waits BACKOFF_BASE * 2 ** (n - 1) seconds
+BACKOFF_BASE = 30
+# A "running" job this old lost its worker and is queued again
+STALE_AFTER = timedelta(minutes=30)
+# Due jobs fetched per claim attempt
+CLAIM_BATCH = 10
+
+
+class Task:
+    def __init__(self, func, max_attempts, on_failure):
+        self.func = func
+        self.name = func.__name__
+        self.max_attempts = max_attempts
+        self.on_failure = on_failure
+
+
+TASKS = {}
+
+
+def task(max_attempts=3, on_failure=None):
+    """Register a function as a background task; `on_failure(*args)` runs after the last attempt."""
+
+    def register(func):
+        TASKS[func.__name__] = Task(func, max_attempts, on_failure)
+        return func
+
+    return register
+
+
+def backoff(attempts):
+    return timedelta(seconds=BACKOFF_BASE * 2 ** (attempts - 1))
+
+
+def enqueue(name, *args, delay=0):
+    """Queue TASKS[name](*args); args must be JSON serializable."""
+    registered = TASKS[name]
+    if getattr(settings, "JOBS_EAGER", False):
+        run_eagerly(registered, args)
+        return None
+
+    return Job.objects.create(
+        task=name,
+        args=list(args),
+        max_attempts=registered.max_attempts,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def enqueue_many(name, args_list, batch_size=1000):
+    """Queue one job per args tuple with bulk INSERTs (backfills); returns the count."""
+    registered = TASKS[name]
+    if getattr(settings, "JOBS_EAGER", False):
+        count = 0
+        for args in args_list:
+            run_eagerly(registered, args)
+            count += 1
+        return count
+
+    now = timezone.now()
+    jobs = [
+        Job(task=name, args=list(args), max_attempts=registered.max_attempts, run_at=now)
+        for args in args_list
+    ]
+    Job.objects.bulk_create(jobs, batch_size=batch_size)
+
+    return len(jobs)
+
+
+def run_eagerly(registered, args):
+    for attempt in range(1, registered.max_attempts + 1):
+        try:
+            registered.func(*args)
+            return
+        except Exception:
+            logger.exception("Task %s%r failed (attempt %d)", registered.name, tuple(args), attempt)
+
+    if registered.on_failure:
+        registered.on_failure(*args)
+
+
+def requeue_stale():
+    """
+    Queue "running" jobs whose worker died again; returns how many. Those that
+    used up their attempts (e.g. an upload that crashes the worker every time)
+    fail instead and run their on_failure hook.
+    """
+    now = timezone.now()
+    stale = Job.objects.filter(status=Job.RUNNING, updated_at__lt=now - STALE_AFTER)
+
+    for job in stale.filter(attempts__gte=F("max_attempts")):
+        # Another process may be failing it at the same time
+        failed = Job.objects.filter(pk=job.pk, status=Job.RUNNING).update(
+            status=Job.FAILED, last_error="Worker died while running the job", updated_at=now
+        )
+        registered = TASKS.get(job.task)
+        if failed and registered is not None and registered.on_failure:
+            registered.on_failure(*job.args)
+
+    return stale.filter(attempts__lt=F("max_attempts")).update(status=Job.QUEUED, updated_at=now)
+
+
+def claim():
+    """Mark the next due job as running and return it (None when idle)."""
+    now = timezone.now()
+    due = list(
+        Job.objects.filter(status=Job.QUEUED, run_at__lte=now)
+        .order_by("run_at")
+        .values_list("pk", flat=True)[:CLAIM_BATCH]
+    )
+    for pk in due:
+        # Another worker may have taken it since the SELECT
+        claimed = Job.objects.filter(pk=pk, status=Job.QUEUED).update(
+            status=Job.RUNNING, attempts=F("attempts") + 1, updated_at=now
+        )
+        if claimed:
+            return Job.objects.get(pk=pk)
+
+    return None
+
+
+def execute(job):
+    registered = TASKS.get(job.task)
+    try:
+        if registered is None:
+            raise LookupError(f"Unknown task {job.task!r}")
+        registered.func(*job.args)
+    except Exception:
+        logger.exception("Job %s failed (attempt %d)", job, job.attempts)
+        job.last_error = traceback.format_exc()
+        if registered is not None and job.attempts < job.max_attempts:
+            job.status = Job.QUEUED
+            job.run_at = timezone.now() + backoff(job.attempts)
+        else:
+            job.status = Job.FAILED
+            if registered is not None and registered.on_failure:
+                registered.on_failure(*job.args)
+        job.save(update_fields=["status", "run_at", "last_error", "updated_at"])
+        return False
+
+    job.delete()
+    return True
+
+
+def run_pending(limit=None):
+    """Execute due jobs until the queue is empty (or `limit` ran); returns how many ran."""
+    ran = 0
+    while limit is None or ran < limit:
+        job = claim()
+        if job is None:
+            break
+        execute(job)
+        ran += 1
+
+    return ran
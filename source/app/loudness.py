@@ -0,0 +1,102 @@
+"""
+Integrated loudness (ITU-R BS.1770 / EBU R128) and sample peak per track,
+for ReplayGain-style playback normalization.
+
+The audio is decoded by ffmpeg to 48 kHz stereo and streamed through the
+K-weighting filter (scipy lfilter, state carried across chunks). Energy is
+summed per 100 ms; 400 ms blocks with 75% overlap are then gated at
+-70 LUFS and 10 LU below the ungated mean, all vectorized with NumPy.
+"""
+
+from .audio import decode_pcm
+
+
+SAMPLE_RATE = 48000
+CHANNELS = 2
+# ReplayGain 2.0 reference level
+REFERENCE_LUFS = -18.0
+
+# K-weighting at 48 kHz: high shelf, then high pass
+SHELF = (
+    [1.53512485958697, -2.69169618940638, 1.19839281085285],
+    [1.0, -1.69065929318241, 0.73248077421585],
+)
+HIGH_PASS = (
+    [1.0, -2.0, 1.0],
+    [1.0, -1.99004745483398, 0.99007225036621],
+)
+
+STEP = SAMPLE_RATE // 10  # 100 ms
+BLOCK_STEPS = 4  # 400 ms gating blocks
+ABSOLUTE_GATE = -70.0
+RELATIVE_GATE = -10.0
+
+READ_SIZE = STEP * CHANNELS * 2 * 50  # 5 s of PCM
+
+
+def block_loudness(power):
+    import numpy as np
+
+    return -0.691 + 10 * np.log10(np.maximum(power, 1e-12))
+
+
+def measure(chunks, channels=CHANNELS):
+    """
+    Return (integrated LUFS, sample peak 0..1) from interleaved 48 kHz int16
+    PCM chunks. Loudness is None for silence or audio shorter than a block.
+    """
+    import numpy as np
+    from scipy.signal import lfilter
+
+    states = [
+        np.zeros((len(SHELF[1]) - 1, channels)),
+        np.zeros((len(HIGH_PASS[1]) - 1, channels)),
+    ]
+    peak = 0
+    energies = []
+    rest = np.empty((0, channels))
+
+    for chunk in chunks:
+        samples = np.frombuffer(chunk, dtype="<i2").reshape(-1, channels)
+        if not len(samples):
+            continue
+        peak = max(peak, int(np.abs(samples.astype(np.int32)).max()))
+
+        weighted = samples / 32768.0
+        for i, (b, a) in enumerate((SHELF, HIGH_PASS)):
+            weighted, states[i] = lfilter(b, a, weighted, axis=0, zi=states[i])
+
+        # Mean square per 100 ms step, summed over channels (all weights are 1)
+        weighted = np.concatenate([rest, weighted])
+        whole = len(weighted) - len(weighted) % STEP
+        steps = (weighted[:whole] ** 2).reshape(-1, STEP, channels).mean(axis=1).sum(axis=1)
+        energies.append(steps)
+        rest = weighted[whole:]
+
+    energies = np.concatenate(energies) if energies else np.empty(0)
+    if len(energies) < BLOCK_STEPS:
+        return None, peak / 32768
+
+    blocks = np.convolve(energies, np.ones(BLOCK_STEPS) / BLOCK_STEPS, mode="valid")
+    loudness = block_loudness(blocks)
+
+    gated = blocks[loudness > ABSOLUTE_GATE]
+    if not len(gated):
+        return None, peak / 32768
+
+    threshold = block_loudness(gated.mean()) + RELATIVE_GATE
+    gated = blocks[(loudness > ABSOLUTE_GATE) & (loudness > threshold)]
+
+    return float(block_loudness(gated.mean())), peak / 32768
+
+
+def analyze(path):
+    """{"loudness", "peak", "replay_gain"} for an audio file on disk."""
+    pcm = decode_pcm(path, SAMPLE_RATE, channels=CHANNELS, read_size=READ_SIZE)
+    loudness, peak = measure(pcm)
+
+    return {
+        "loudness": None if loudness is None else round(loudness, 2),
+        "peak": round(peak, 6),
+        "replay_gain": None if loudness is None else round(REFERENCE_LUFS - loudness, 2),
+    }
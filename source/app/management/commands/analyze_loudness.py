@@ -0,0 +1,73 @@
+import multiprocessing
+import os
+import shutil
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from app.audio import ffmpeg_binary
+from app.caching import bump_version
+from app.loudness import analyze
+from app.models import Song
+
+
+def analyze_file(item):
+    # Runs in a pool process: no database access, only decoding
+    pk, path = item
+    try:
+        return pk, analyze(path), None
+    except Exception as exc:
+        return pk, None, str(exc)
+
+
+class Command(BaseCommand):
+    help = "Compute loudness / peak / ReplayGain for songs, in parallel processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Re-analyze every song, not only those without a loudness value.",
+        )
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Decoding processes (default: one per CPU).",
+        )
+        parser.add_argument("--batch-size", type=int, default=200)
+
+    def handle(self, *args, **options):
+        if not shutil.which(ffmpeg_binary()):
+            raise CommandError("analyze_loudness needs ffmpeg (settings.FFMPEG_BINARY)")
+
+        songs = Song.objects.exclude(audio_file="")
+        if not options["all"]:
+            songs = songs.filter(loudness__isnull=True)
+        storage = Song._meta.get_field("audio_file").storage
+        items = [
+            (pk, storage.path(name))
+            for pk, name in songs.order_by("pk").values_list("pk", "audio_file")
+        ]
+
+        analyzed, failed, batch = 0, 0, []
+        with multiprocessing.get_context("fork").Pool(options["processes"]) as pool:
+            for pk, result, error in pool.imap_unordered(analyze_file, items, chunksize=4):
+                if error:
+                    failed += 1
+                    self.stderr.write(f"Song {pk}: {error}")
+                    continue
+
+                batch.append(Song(pk=pk, updated_at=timezone.now(), **result))
+                if len(batch) >= options["batch_size"]:
+                    analyzed += self.save(batch)
+                    batch = []
+        analyzed += self.save(batch)
+
+        # Song payloads changed (ETags / cached lists)
+        bump_version("songs")
+        self.stdout.write(self.style.SUCCESS(f"{analyzed} song(s) analyzed, {failed} failed"))
+
+    def save(self, batch):
+        Song.objects.bulk_update(batch, ["loudness", "peak", "replay_gain", "updated_at"])
+        return len(batch)
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Build the song-to-song similarity table from favorites and albums."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="Only recompute songs whose favorites/albums changed since the last build.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            import numpy  # noqa: F401
+            import scipy  # noqa: F401
+        except ImportError:
+            raise CommandError("build_similarity needs numpy and scipy (pip install -r requirements.txt)")
+
+        from app.recommendations import build_similarity
+
+        written = build_similarity(incremental=options["incremental"])
+
+        self.stdout.write(self.style.SUCCESS(f"Neighbours rewritten for {written} song(s)"))
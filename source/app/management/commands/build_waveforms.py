@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from app.jobs import enqueue_many
+from app.models import Song
+
+
+class Command(BaseCommand):
+    help = "Queue waveform jobs for songs without one (run `manage.py runworker` to process them)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Rebuild every song's waveform, not only the missing ones.",
+        )
+
+    def handle(self, *args, **options):
+        songs = Song.objects.filter(status=Song.READY)
+        if not options["all"]:
+            songs = songs.filter(waveform="")
+
+        song_ids = songs.order_by("pk").values_list("pk", flat=True).iterator()
+        queued = enqueue_many("build_song_waveform", ((pk,) for pk in song_ids))
+
+        self.stdout.write(self.style.SUCCESS(f"Queued {queued} waveform job(s)"))
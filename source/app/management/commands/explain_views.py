@@ -0,0 +1,123 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.urls import URLPattern, URLResolver, get_resolver
+
+from rest_framework.generics import ListAPIView, ListCreateAPIView
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.test import APIRequestFactory
+
+
+def iter_patterns(patterns, prefix=""):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from iter_patterns(pattern.url_patterns, prefix + str(pattern.pattern))
+        elif isinstance(pattern, URLPattern):
+            yield prefix + str(pattern.pattern), pattern
+
+
+def full_scans(plan, vendor):
+    """Return the tables the plan reads with a full scan."""
+    if vendor == "mysql":
+        tables = []
+
+        def walk(node):
+            if isinstance(node, dict):
+                table = node.get("table")
+                if isinstance(table, dict) and table.get("access_type") == "ALL":
+                    tables.append(table.get("table_name"))
+                for value in node.values():
+                    walk(value)
+            elif isinstance(node, list):
+                for value in node:
+                    walk(value)
+
+        walk(json.loads(plan))
+        return tables
+
+    if vendor == "sqlite":
+        # "SCAN app_song" vs "SCAN app_song USING INDEX ..."
+        return [
+            line.split("SCAN ", 1)[1].split()[0]
+            for line in plan.splitlines()
+            if "SCAN " in line and " USING " not in line
+        ]
+
+    if vendor == "postgresql":
+        return [line.split(" on ", 1)[1].split()[0] for line in plan.splitlines() if "Seq Scan on" in line]
+
+    return []
+
+
+def sorts(plan, vendor):
+    """True when the plan sorts rows itself, so a LIMIT can't stop a scan early."""
+    if vendor == "mysql":
+        return '"using_filesort": true' in plan.replace("\n", "")
+    if vendor == "sqlite":
+        return "USE TEMP B-TREE" in plan
+    if vendor == "postgresql":
+        return "Sort" in plan
+
+    return True
+
+
+def bounded(queryset, plan, vendor):
+    """
+    A scan with no WHERE and no sort stops after the LIMIT rows, e.g. the
+    first page of /api/genres/: cheap however big the table gets.
+    """
+    return not queryset.query.where and not sorts(plan, vendor)
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN the first page of every API list view and flag full table scans."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fail",
+            action="store_true",
+            help="Exit with an error when any view does a full scan (for CI).",
+        )
+
+    def handle(self, *args, **options):
+        factory = APIRequestFactory()
+        # Per-user views only need an id to build their query
+        user = User.objects.order_by("id").first() or User(pk=0, username="explain")
+        flagged = []
+
+        for route, pattern in iter_patterns(get_resolver().url_patterns):
+            view_class = getattr(pattern.callback, "view_class", None)
+            if not view_class or not issubclass(view_class, (ListAPIView, ListCreateAPIView)):
+                continue
+
+            view = view_class()
+            view.setup(factory.get("/" + route), **{key: 1 for key in pattern.pattern.converters})
+            # What dispatch() hands to get_queryset(): a DRF Request (query_params etc.)
+            view.request = Request(view.request)
+            view.request.user = user
+            view.format_kwarg = None
+
+            try:
+                queryset = view.get_queryset()
+            except Exception as e:
+                self.stdout.write(self.style.WARNING(f"skip  /{route} ({e})"))
+                continue
+
+            vendor = connections[queryset.db].vendor
+            page = queryset[: api_settings.PAGE_SIZE or 20]
+            plan = page.explain(format="json") if vendor == "mysql" else page.explain()
+            tables = [] if bounded(queryset, plan, vendor) else full_scans(plan, vendor)
+
+            if tables:
+                flagged.append(route)
+                self.stdout.write(
+                    self.style.ERROR(f"SCAN  /{route} ({view_class.__name__}): {', '.join(tables)}")
+                )
+            else:
+                self.stdout.write(self.style.SUCCESS(f"ok    /{route} ({view_class.__name__})"))
+
+        if flagged and options["fail"]:
+            raise CommandError(f"{len(flagged)} list view(s) do full table scans")
@@ -0,0 +1,118 @@
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+async def read_chunked(reader):
+    while size := int((await reader.readline()).split(b";")[0], 16):
+        await reader.readexactly(size + 2)
+    # Trailers end with an empty line
+    while await reader.readline() not in (b"\r\n", b""):
+        pass
+
+
+async def worker(host, port, target, headers, jobs, latencies, errors):
+    """One keep-alive HTTP/1.1 connection sending requests back to back."""
+    reader = writer = None
+    request = (
+        f"GET {target} HTTP/1.1\r\nHost: {host}\r\n{headers}Connection: keep-alive\r\n\r\n"
+    ).encode()
+
+    while True:
+        try:
+            jobs.get_nowait()
+        except asyncio.QueueEmpty:
+            break
+
+        started = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            writer.write(request)
+            status_line = await reader.readline()
+            length, chunked, close = 0, False, False
+            while (line := await reader.readline()) not in (b"\r\n", b""):
+                name, _, value = line.decode("latin-1").partition(":")
+                name, value = name.lower(), value.strip().lower()
+                if name == "content-length":
+                    length = int(value)
+                elif name == "transfer-encoding":
+                    chunked = value == "chunked"
+                elif name == "connection":
+                    close = value == "close"
+            if chunked:
+                await read_chunked(reader)
+            else:
+                await reader.readexactly(length)
+            if not status_line.split()[1].startswith(b"2"):
+                errors.append(status_line.decode().strip())
+            if close:
+                writer.close()
+                writer = None
+        except (OSError, asyncio.IncompleteReadError, IndexError, ValueError) as exc:
+            errors.append(repr(exc))
+            writer = None
+            continue
+
+        latencies.append(time.perf_counter() - started)
+
+    if writer is not None:
+        writer.close()
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure throughput/latency of a running server at a given concurrency, "
+        "e.g. gunicorn (WSGI) vs uvicorn (ASGI) serving /api/songs/ and /api/async/songs/."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("url", nargs="+", help="Full URL(s) to hit, one run per URL.")
+        parser.add_argument("--concurrency", type=int, default=100)
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument("--header", action="append", default=[], help="Extra 'Name: value' header.")
+
+    def handle(self, *args, **options):
+        for url in options["url"]:
+            parts = urlsplit(url)
+            if parts.scheme != "http" or not parts.hostname:
+                raise CommandError(f"Only plain http:// URLs are supported: {url}")
+
+            target = parts.path + (f"?{parts.query}" if parts.query else "")
+            headers = "".join(f"{header}\r\n" for header in options["header"])
+            latencies, errors = [], []
+
+            started = time.perf_counter()
+            asyncio.run(
+                self.run(parts.hostname, parts.port or 80, target or "/", headers, options, latencies, errors)
+            )
+            elapsed = time.perf_counter() - started
+
+            self.report(url, options["concurrency"], elapsed, latencies, errors)
+
+    async def run(self, host, port, target, headers, options, latencies, errors):
+        jobs = asyncio.Queue()
+        for _ in range(options["requests"]):
+            jobs.put_nowait(None)
+
+        await asyncio.gather(
+            *(
+                worker(host, port, target, headers, jobs, latencies, errors)
+                for _ in range(options["concurrency"])
+            )
+        )
+
+    def report(self, url, concurrency, elapsed, latencies, errors):
+        self.stdout.write(f"{url} (concurrency {concurrency})")
+        if latencies:
+            ordered = sorted(latencies)
+            p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+            self.stdout.write(
+                f"  {len(latencies) / elapsed:.0f} req/s, "
+                f"median {statistics.median(ordered) * 1000:.1f} ms, p99 {p99 * 1000:.1f} ms"
+            )
+        if errors:
+            self.stdout.write(self.style.WARNING(f"  {len(errors)} error(s), first: {errors[0]}"))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+
+class Command(BaseCommand):
+    help = "Delete expired outstanding JWT refresh tokens (and their blacklist rows), in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        # Fixed cutoff so the loop ends even while new tokens expire
+        expired = OutstandingToken.objects.filter(expires_at__lte=timezone.now())
+        deleted = {}
+
+        while True:
+            pks = list(expired.order_by("pk").values_list("pk", flat=True)[:batch_size])
+            if not pks:
+                break
+
+            # BlacklistedToken rows go with their token (on_delete=CASCADE)
+            _, per_model = OutstandingToken.objects.filter(pk__in=pks).delete()
+            for label, count in per_model.items():
+                deleted[label] = deleted.get(label, 0) + count
+
+        for label in ("token_blacklist.OutstandingToken", "token_blacklist.BlacklistedToken"):
+            self.stdout.write(self.style.SUCCESS(f"{label}: {deleted.get(label, 0)} row(s) deleted"))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from app.caching import bump_version
+from app.counters import COUNTERS, repair
+from app.models import Artist, Song
+
+
+# API payloads (ETags) showing each model's counters
+ETAG_NAMESPACES = {Song: "favorite_counts", Artist: "artists"}
+
+
+class Command(BaseCommand):
+    help = "Repair drift in the denormalized favorite/song counters, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+
+        for model, field, related, fk in COUNTERS:
+            label = f"{model.__name__}.{field}"
+            last_pk, fixed = 0, 0
+
+            while True:
+                pks = list(
+                    model.objects.filter(pk__gt=last_pk)
+                    .order_by("pk")
+                    .values_list("pk", flat=True)[:batch_size]
+                )
+                if not pks:
+                    break
+
+                fixed += repair(model, field, related, fk, pks)
+                last_pk = pks[-1]
+
+            if fixed and model in ETAG_NAMESPACES:
+                bump_version(ETAG_NAMESPACES[model])
+
+            self.stdout.write(self.style.SUCCESS(f"{label}: {fixed} row(s) repaired"))
@@ -0,0 +1,79 @@
+import multiprocessing
+import os
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from app.jobs import requeue_stale, run_pending
+
+
+# How often the parent process re-queues jobs whose worker died
+REQUEUE_EVERY = 60
+
+
+def work(sleep):
+    # Never share the parent's database connections across a fork
+    connections.close_all()
+
+    while True:
+        if not run_pending():
+            connections.close_all()
+            time.sleep(sleep)
+
+
+class Command(BaseCommand):
+    help = "Run background jobs (uploads processing) in a pool of worker processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Worker processes (default: one per CPU).",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=1.0,
+            help="Seconds to wait when the queue is empty.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Run the jobs due now in this process, then exit.",
+        )
+
+    def requeue(self):
+        requeued = requeue_stale()
+        if requeued:
+            self.stdout.write(f"Re-queued {requeued} stale job(s)")
+
+    def handle(self, *args, **options):
+        self.requeue()
+
+        if options["once"]:
+            ran = run_pending()
+            self.stdout.write(self.style.SUCCESS(f"Ran {ran} job(s)"))
+            return
+
+        connections.close_all()
+        context = multiprocessing.get_context("fork")
+        pool = [
+            context.Process(target=work, args=(options["sleep"],), daemon=True)
+            for _ in range(options["processes"])
+        ]
+        for process in pool:
+            process.start()
+        self.stdout.write(f"Started {len(pool)} worker(s), Ctrl+C to stop")
+
+        try:
+            # Children run jobs; the parent keeps recovering the ones lost by
+            # a crashed worker (on any host) while the pool is up
+            while any(process.is_alive() for process in pool):
+                time.sleep(REQUEUE_EVERY)
+                self.requeue()
+                connections.close_all()
+        except KeyboardInterrupt:
+            for process in pool:
+                process.terminate()
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from app.jobs import enqueue_many
+from app.models import Song
+
+
+class Command(BaseCommand):
+    help = "Queue HLS transcoding jobs for songs without renditions (run `manage.py runworker`)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Re-queue every song; renditions for unchanged audio are reused.",
+        )
+
+    def handle(self, *args, **options):
+        songs = Song.objects.filter(status=Song.READY)
+        if not options["all"]:
+            songs = songs.filter(hls_playlist="")
+
+        song_ids = songs.order_by("pk").values_list("pk", flat=True).iterator()
+        queued = enqueue_many("transcode_song_hls", ((pk,) for pk in song_ids))
+
+        self.stdout.write(self.style.SUCCESS(f"Queued {queued} transcoding job(s)"))
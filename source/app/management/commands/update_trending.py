@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from app.trending import buffer, update_rankings
+
+
+class Command(BaseCommand):
+    help = "Recompute the trending / top-this-week charts (run every few minutes)."
+
+    def handle(self, *args, **options):
+        written = buffer.drain()
+        update_rankings()
+
+        self.stdout.write(self.style.SUCCESS(f"Rankings updated ({written} activity rows)"))
@@ -0,0 +1,150 @@
+"""
+Constant-cost, race-free membership changes on many-to-many through tables
+(User.favorite_songs, Album.songs).
+
+They never load the related set into Python. The rows that changed are read
+from the INSERT / DELETE statements themselves (RETURNING on SQLite and
+PostgreSQL); MySQL has no RETURNING, so writers of one instance are
+serialized on its row lock and the existing rows are selected first. Either
+way, when two requests race only the one that actually inserted or deleted a
+row reports it. m2m_changed
+"post_add" / "post_remove" is sent with those rows, so the receivers in
+app/signals.py (counters, trending, similarity) count every change once.
+"""
+
+from django.db import connections, router, transaction
+from django.db.models.signals import m2m_changed
+
+
+# Rows per INSERT / DELETE statement (SQLite allows 32766 parameters)
+BATCH_SIZE = 500
+
+
+def through_fields(instance, field_name):
+    field = instance._meta.get_field(field_name)
+
+    return (
+        field.remote_field.through,
+        field.m2m_field_name(),
+        field.m2m_reverse_field_name(),
+        field.related_model,
+    )
+
+
+def send_changed(instance, through, model, action, pk_set):
+    if pk_set:
+        m2m_changed.send(
+            sender=through,
+            instance=instance,
+            action=action,
+            reverse=False,
+            model=model,
+            pk_set=set(pk_set),
+            using=router.db_for_write(through, instance=instance),
+        )
+
+
+def write_rows(through, source, target, instance, pks, insert):
+    """
+    INSERT (skipping existing rows) or DELETE the through rows linking
+    `instance` to `pks`; returns the pks this statement actually changed.
+    """
+    using = router.db_for_write(through, instance=instance)
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    table = quote(through._meta.db_table)
+    source_column = quote(through._meta.get_field(source).column)
+    target_column = quote(through._meta.get_field(target).column)
+    pks = sorted(pks)
+    changed = set()
+
+    if connection.vendor == "mysql":
+        owner = instance._meta
+        with transaction.atomic(using=using), connection.cursor() as cursor:
+            # Concurrent writes for this instance wait here until we commit
+            cursor.execute(
+                f"SELECT 1 FROM {quote(owner.db_table)} WHERE {quote(owner.pk.column)} = %s FOR UPDATE",
+                [instance.pk],
+            )
+            for start in range(0, len(pks), BATCH_SIZE):
+                batch = pks[start : start + BATCH_SIZE]
+                placeholders = ", ".join(["%s"] * len(batch))
+                cursor.execute(
+                    f"SELECT {target_column} FROM {table} "
+                    f"WHERE {source_column} = %s AND {target_column} IN ({placeholders})",
+                    [instance.pk, *batch],
+                )
+                existing = {row[0] for row in cursor.fetchall()}
+                if insert:
+                    rows = [pk for pk in batch if pk not in existing]
+                    if rows:
+                        values = ", ".join(["(%s, %s)"] * len(rows))
+                        cursor.execute(
+                            f"INSERT IGNORE INTO {table} ({source_column}, {target_column}) VALUES {values}",
+                            [value for pk in rows for value in (instance.pk, pk)],
+                        )
+                    changed.update(rows)
+                elif existing:
+                    placeholders = ", ".join(["%s"] * len(existing))
+                    cursor.execute(
+                        f"DELETE FROM {table} WHERE {source_column} = %s AND {target_column} IN ({placeholders})",
+                        [instance.pk, *existing],
+                    )
+                    changed.update(existing)
+        return changed
+
+    with connection.cursor() as cursor:
+        for start in range(0, len(pks), BATCH_SIZE):
+            batch = pks[start : start + BATCH_SIZE]
+            if insert:
+                values = ", ".join(["(%s, %s)"] * len(batch))
+                cursor.execute(
+                    f"INSERT INTO {table} ({source_column}, {target_column}) VALUES {values} "
+                    f"ON CONFLICT DO NOTHING RETURNING {target_column}",
+                    [value for pk in batch for value in (instance.pk, pk)],
+                )
+            else:
+                placeholders = ", ".join(["%s"] * len(batch))
+                cursor.execute(
+                    f"DELETE FROM {table} WHERE {source_column} = %s AND {target_column} IN ({placeholders}) "
+                    f"RETURNING {target_column}",
+                    [instance.pk, *batch],
+                )
+            changed.update(row[0] for row in cursor.fetchall())
+
+    return changed
+
+
+def add_members(instance, field_name, pks):
+    """Add many related rows in one INSERT per batch; returns the pks actually added."""
+    through, source, target, model = through_fields(instance, field_name)
+    pks = set(model.objects.filter(pk__in=pks).values_list("pk", flat=True))
+
+    added = write_rows(through, source, target, instance, pks, insert=True)
+    send_changed(instance, through, model, "post_add", added)
+
+    return added
+
+
+def remove_members(instance, field_name, pks):
+    """Remove related rows in one DELETE per batch; returns the number removed."""
+    through, source, target, model = through_fields(instance, field_name)
+
+    removed = write_rows(through, source, target, instance, set(pks), insert=False)
+    send_changed(instance, through, model, "post_remove", removed)
+
+    return len(removed)
+
+
+def toggle_member(instance, field_name, pk):
+    """Remove `pk` if present, add it otherwise; returns True when it ends up present."""
+    through, source, target, model = through_fields(instance, field_name)
+    if write_rows(through, source, target, instance, {pk}, insert=False):
+        send_changed(instance, through, model, "post_remove", {pk})
+        return False
+
+    # A concurrent toggle may have inserted it first: then it sent post_add
+    added = write_rows(through, source, target, instance, {pk}, insert=True)
+    send_changed(instance, through, model, "post_add", added)
+
+    return True
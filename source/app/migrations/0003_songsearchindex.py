@@ -0,0 +1,107 @@
+# Generated by Django 5.2.6 on 2025-10-01 10:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE app_songsearchindex_fts USING fts5(
+        title, artist_name, genre_names, lyrics,
+        content='app_songsearchindex', content_rowid='song_id'
+    )
+    """,
+    """
+    CREATE TRIGGER app_songsearchindex_ai AFTER INSERT ON app_songsearchindex BEGIN
+        INSERT INTO app_songsearchindex_fts(rowid, title, artist_name, genre_names, lyrics)
+        VALUES (new.song_id, new.title, new.artist_name, new.genre_names, new.lyrics);
+    END
+    """,
+    """
+    CREATE TRIGGER app_songsearchindex_ad AFTER DELETE ON app_songsearchindex BEGIN
+        INSERT INTO app_songsearchindex_fts(app_songsearchindex_fts, rowid, title, artist_name, genre_names, lyrics)
+        VALUES ('delete', old.song_id, old.title, old.artist_name, old.genre_names, old.lyrics);
+    END
+    """,
+    """
+    CREATE TRIGGER app_songsearchindex_au AFTER UPDATE ON app_songsearchindex BEGIN
+        INSERT INTO app_songsearchindex_fts(app_songsearchindex_fts, rowid, title, artist_name, genre_names, lyrics)
+        VALUES ('delete', old.song_id, old.title, old.artist_name, old.genre_names, old.lyrics);
+        INSERT INTO app_songsearchindex_fts(rowid, title, artist_name, genre_names, lyrics)
+        VALUES (new.song_id, new.title, new.artist_name, new.genre_names, new.lyrics);
+    END
+    """,
+    "INSERT INTO app_songsearchindex_fts(app_songsearchindex_fts) VALUES ('rebuild')",
+]
+
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS app_songsearchindex_ai",
+    "DROP TRIGGER IF EXISTS app_songsearchindex_ad",
+    "DROP TRIGGER IF EXISTS app_songsearchindex_au",
+    "DROP TABLE IF EXISTS app_songsearchindex_fts",
+]
+
+MYSQL_FORWARD = [
+    "ALTER TABLE app_songsearchindex ADD FULLTEXT INDEX app_songsearch_ft "
+    "(title, artist_name, genre_names, lyrics)",
+]
+
+MYSQL_BACKWARD = [
+    "ALTER TABLE app_songsearchindex DROP INDEX app_songsearch_ft",
+]
+
+
+def backfill_index(apps, schema_editor):
+    Song = apps.get_model("app", "Song")
+    SongSearchIndex = apps.get_model("app", "SongSearchIndex")
+
+    songs = Song.objects.select_related("artist").prefetch_related("genres").order_by("id")
+    batch = []
+    for song in songs.iterator(chunk_size=1000):
+        batch.append(
+            SongSearchIndex(
+                song=song,
+                title=song.title,
+                artist_name=song.artist.name if song.artist else "",
+                genre_names=" ".join(genre.name for genre in song.genres.all()),
+                lyrics=song.lyrics,
+            )
+        )
+        if len(batch) >= 1000:
+            SongSearchIndex.objects.bulk_create(batch)
+            batch = []
+
+    SongSearchIndex.objects.bulk_create(batch)
+
+
+def run_vendor_sql(statements):
+    def run(apps, schema_editor):
+        for sql in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(sql)
+
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0002_remove_song_genre_song_genres'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SongSearchIndex',
+            fields=[
+                ('song', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_index', serialize=False, to='app.song')),
+                ('title', models.CharField(max_length=255)),
+                ('artist_name', models.CharField(blank=True, max_length=255)),
+                ('genre_names', models.TextField(blank=True)),
+                ('lyrics', models.TextField(blank=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_index, migrations.RunPython.noop),
+        migrations.RunPython(
+            run_vendor_sql({"sqlite": SQLITE_FORWARD, "mysql": MYSQL_FORWARD}),
+            run_vendor_sql({"sqlite": SQLITE_BACKWARD, "mysql": MYSQL_BACKWARD}),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2025-10-05 09:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0004_song_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='song',
+            index=models.Index(fields=['created_at', 'id'], name='song_created_id_idx'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.6 on 2025-10-08 11:30
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_rows(related, fk):
+    counts = (
+        related.objects.filter(**{fk: OuterRef("pk")})
+        .order_by()
+        .values(fk)
+        .annotate(total=Count("*"))
+        .values("total")
+    )
+
+    return Coalesce(Subquery(counts), 0)
+
+
+def backfill_counters(apps, schema_editor):
+    # Song.favorite_count: User.favorite_songs is added at runtime
+    # (User.add_to_class) and is not in the migration state, run
+    # `manage.py recount` after migrating.
+    Song = apps.get_model("app", "Song")
+    Album = apps.get_model("app", "Album")
+    Artist = apps.get_model("app", "Artist")
+
+    Album.objects.update(song_count=count_rows(Album.songs.through, "album"))
+    Artist.objects.update(song_count=count_rows(Song, "artist"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_song_album_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='album',
+            name='song_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='artist',
+            name='song_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='song',
+            name='favorite_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='song',
+            index=models.Index(fields=['favorite_count', 'id'], name='song_favorites_id_idx'),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
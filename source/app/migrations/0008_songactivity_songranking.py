@@ -0,0 +1,40 @@
+# Generated by Django 5.2.6 on 2025-10-10 08:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0007_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SongActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField()),
+                ('plays', models.PositiveIntegerField(default=0)),
+                ('favorites', models.PositiveIntegerField(default=0)),
+                ('song', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity', to='app.song')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['bucket'], name='activity_bucket_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SongRanking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chart', models.CharField(choices=[('trending', 'Trending now'), ('week', 'Top this week')], max_length=20)),
+                ('position', models.PositiveIntegerField()),
+                ('score', models.FloatField()),
+                ('song', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rankings', to='app.song')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('chart', 'position'), name='ranking_chart_position_uniq')],
+            },
+        ),
+    ]
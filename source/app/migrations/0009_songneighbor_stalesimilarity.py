@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2025-10-12 13:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0008_songactivity_songranking'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StaleSimilarity',
+            fields=[
+                ('song', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='app.song')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SongNeighbor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField()),
+                ('neighbor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbor_of', to='app.song')),
+                ('song', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbors', to='app.song')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('song', 'rank'), name='neighbor_song_rank_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2025-10-14 11:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0011_song_status_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='artist',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='song',
+            name='cover_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2025-10-14 16:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0012_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='song',
+            name='waveform',
+            field=models.FileField(blank=True, editable=False, upload_to='songs/'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2025-10-15 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0013_song_waveform'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='song',
+            name='loudness',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='song',
+            name='peak',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='song',
+            name='replay_gain',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2025-10-15 17:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0014_song_loudness'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='song',
+            name='hls_playlist',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+    ]
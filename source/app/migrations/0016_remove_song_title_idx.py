@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2025-10-18 10:12
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0015_song_hls_playlist'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='song',
+            name='song_title_idx',
+        ),
+    ]
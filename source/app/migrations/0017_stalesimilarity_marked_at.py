@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2025-10-18 11:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0016_remove_song_title_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stalesimilarity',
+            name='marked_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import FileExtensionValidator
+from django.utils import timezone
 
 
 class Genre(models.Model):
@@ -15,19 +16,45 @@ class Artist(models.Model):
     name = models.CharField(max_length=255)
     bio = models.TextField(blank=True)
     image = models.ImageField(upload_to="artists/", null=True, blank=True)
+    # Resized WebP/AVIF/JPEG copies of `image` (app/images.py)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+    # Denormalized, maintained by signals (app/counters.py)
+    song_count = models.IntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.name
 
 
+class SongQuerySet(models.QuerySet):
+    def with_related(self):
+        # Everything SongSerializer touches, in a fixed number of queries
+        return self.select_related("artist", "uploaded_by").prefetch_related("genres")
+
+    def ready(self):
+        # Processed uploads only: pending and failed songs stay off the catalog
+        return self.filter(status=Song.READY)
+
+
 class Song(models.Model):
+    # Upload processing (app/tasks.py)
+    PENDING = "pending"
+    READY = "ready"
+    FAILED = "failed"
+    STATUS_CHOICES = [(PENDING, "Pending"), (READY, "Ready"), (FAILED, "Failed")]
+
     title = models.CharField(max_length=255)
     cover_image = models.ImageField(upload_to="covers/", null=True, blank=True)
+    # Resized WebP/AVIF/JPEG copies of `cover_image` (app/images.py)
+    cover_variants = models.JSONField(default=dict, blank=True, editable=False)
     audio_file = models.FileField(
         upload_to="songs/",
         validators=[FileExtensionValidator(allowed_extensions=["mp3"])],
     )
     lyrics = models.TextField(blank=True)
+    # Seek-bar peaks beside the audio file (app/waveform.py)
+    waveform = models.FileField(upload_to="songs/", blank=True, editable=False)
+    # Master playlist of the HLS renditions in media storage (app/hls.py)
+    hls_playlist = models.CharField(max_length=255, blank=True, editable=False)
 
     artist = models.ForeignKey(
         Artist, on_delete=models.SET_NULL, null=True, related_name="songs"
@@ -35,16 +62,159 @@ class Song(models.Model):
     genres = models.ManyToManyField(Genre, blank=True, related_name="songs")
     uploaded_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Denormalized, maintained by signals (app/counters.py)
+    favorite_count = models.IntegerField(default=0, editable=False)
+    # Read from the uploaded MP3 (app/audio.py)
+    duration = models.FloatField(null=True, blank=True, editable=False)
+    bitrate = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    sample_rate = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    file_size = models.PositiveBigIntegerField(null=True, blank=True, editable=False)
+    content_hash = models.CharField(max_length=64, blank=True, editable=False)
+    # Playback normalization (app/loudness.py): integrated LUFS, sample
+    # peak (0..1) and the ReplayGain 2.0 gain in dB towards -18 LUFS
+    loudness = models.FloatField(null=True, blank=True, editable=False)
+    peak = models.FloatField(null=True, blank=True, editable=False)
+    replay_gain = models.FloatField(null=True, blank=True, editable=False)
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default=PENDING, editable=False
+    )
+
+    objects = SongQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of the song feeds (app/pagination.py)
+            models.Index(fields=["created_at", "id"], name="song_created_id_idx"),
+            # artist_detail: filter(artist=...).order_by("-id")
+            models.Index(fields=["artist", "id"], name="song_artist_id_idx"),
+            # Most favorited
+            models.Index(fields=["favorite_count", "id"], name="song_favorites_id_idx"),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.artist.name if self.artist else 'Unknown Artist'}"
 
 
+class SongSearchIndex(models.Model):
+    # Denormalized search document (see app/search.py), one row per Song
+    song = models.OneToOneField(
+        Song, on_delete=models.CASCADE, primary_key=True, related_name="search_index"
+    )
+    title = models.CharField(max_length=255)
+    artist_name = models.CharField(max_length=255, blank=True)
+    genre_names = models.TextField(blank=True)
+    lyrics = models.TextField(blank=True)
+
+    def __str__(self):
+        return self.title
+
+
+class SongActivity(models.Model):
+    # Append-only batches of play/favorite events per hour (app/trending.py)
+    song = models.ForeignKey(Song, on_delete=models.CASCADE, related_name="activity")
+    bucket = models.DateTimeField()
+    plays = models.PositiveIntegerField(default=0)
+    favorites = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [models.Index(fields=["bucket"], name="activity_bucket_idx")]
+
+
+class SongRanking(models.Model):
+    # Precomputed charts, rewritten by `manage.py update_trending`
+    TRENDING = "trending"
+    WEEK = "week"
+    CHART_CHOICES = [(TRENDING, "Trending now"), (WEEK, "Top this week")]
+
+    chart = models.CharField(max_length=20, choices=CHART_CHOICES)
+    position = models.PositiveIntegerField()
+    song = models.ForeignKey(Song, on_delete=models.CASCADE, related_name="rankings")
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["chart", "position"], name="ranking_chart_position_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.chart} #{self.position}"
+
+
+class SongNeighbor(models.Model):
+    # Top-k most similar songs, built offline by `manage.py build_similarity`
+    song = models.ForeignKey(Song, on_delete=models.CASCADE, related_name="neighbors")
+    neighbor = models.ForeignKey(Song, on_delete=models.CASCADE, related_name="neighbor_of")
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["song", "rank"], name="neighbor_song_rank_uniq"),
+        ]
+
+
+class StaleSimilarity(models.Model):
+    # Songs whose favorites changed since the last similarity build
+    song = models.OneToOneField(Song, on_delete=models.CASCADE, primary_key=True)
+    # Moved forward on every change, so a build only clears what it has seen
+    marked_at = models.DateTimeField(default=timezone.now)
+
+
+class Job(models.Model):
+    # Background task queue, drained by `manage.py runworker` (app/jobs.py)
+    QUEUED = "queued"
+    RUNNING = "running"
+    FAILED = "failed"
+    STATUS_CHOICES = [(QUEUED, "Queued"), (RUNNING, "Running"), (FAILED, "Failed")]
+
+    task = models.CharField(max_length=100)
+    args = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_at = models.DateTimeField()
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Next due job: status=queued, run_at <= now, order by run_at
+            models.Index(fields=["status", "run_at"], name="job_status_run_at_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.task}{tuple(self.args)} [{self.status}]"
+
+
+class AlbumQuerySet(models.QuerySet):
+    def with_song_preview(self, limit):
+        # The newest `limit` songs per album, in constant queries
+        return self.prefetch_related(
+            models.Prefetch(
+                "songs",
+                queryset=Song.objects.with_related().order_by("-id")[:limit],
+                to_attr="preview_songs",
+            )
+        )
+
+
 class Album(models.Model):
     name = models.CharField(max_length=255)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     songs = models.ManyToManyField(Song, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Denormalized, maintained by signals (app/counters.py)
+    song_count = models.IntegerField(default=0, editable=False)
+
+    objects = AlbumQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # A user's albums, newest first
+            models.Index(fields=["user", "created_at"], name="album_user_created_idx"),
+        ]
 
     def __str__(self):
         return f"{self.name} - {self.user.username}"
@@ -0,0 +1,120 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+def encode_cursor(obj):
+    raw = f"{obj.created_at.isoformat()}|{obj.pk}"
+
+    return urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(encoded):
+    """(created_at, pk) from a cursor string; raises ValueError when malformed."""
+    try:
+        created_at, pk = urlsafe_b64decode(encoded.encode()).decode().split("|")
+        created_at = parse_datetime(created_at)
+        pk = int(pk)
+    except (TypeError, ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+
+    if created_at is None:
+        raise ValueError("Invalid cursor")
+
+    return created_at, pk
+
+
+def after_cursor(queryset, cursor):
+    """Newest-first rows strictly after `cursor` (None: from the start)."""
+    queryset = queryset.order_by("-created_at", "-id")
+    if cursor:
+        created_at, pk = cursor
+        # (created_at, id) < cursor, written so the index range on created_at applies
+        queryset = queryset.filter(
+            Q(created_at__lte=created_at) & (Q(created_at__lt=created_at) | Q(id__lt=pk))
+        )
+
+    return queryset
+
+
+class KeysetPagination(BasePagination):
+    """
+    Newest-first keyset pagination on (created_at, id).
+
+    Each page is an index range scan from the cursor (see the
+    song_created_id_idx index), with no OFFSET and no COUNT(*), so deep
+    pages cost the same as the first one.
+    """
+
+    page_size = api_settings.PAGE_SIZE
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    def encode_cursor(self, obj):
+        return encode_cursor(obj)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            return decode_cursor(encoded)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        queryset = after_cursor(queryset, self.decode_cursor(request))
+
+        rows = list(queryset[: self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        rows = rows[: self.page_size]
+        self.next_cursor = self.encode_cursor(rows[-1]) if self.has_next else None
+
+        return rows
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+
+        url = self.request.build_absolute_uri()
+
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+
+class KeysetOrPageNumberMixin:
+    """
+    Numbered pages (count / next / previous) by default; clients opt in to
+    keyset pages with `?cursor=` (empty for the first page).
+    """
+
+    @property
+    def paginator(self):
+        if not hasattr(self, "_paginator"):
+            if KeysetPagination.cursor_query_param in self.request.query_params:
+                self._paginator = KeysetPagination()
+            else:
+                self._paginator = PageNumberPagination()
+
+        return self._paginator
@@ -0,0 +1,149 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import Song, Album, SongNeighbor, StaleSimilarity
+
+
+# Neighbours kept per song
+TOP_K = 20
+# Songs whose similarity rows are computed per sparse product
+BLOCK_SIZE = 1000
+# Favorites used as seeds for /api/recommendations/
+SEED_FAVORITES = 20
+
+
+def interaction_matrix():
+    """
+    Binary user x song matrix from favorites and album memberships.
+
+    Returns (csr_matrix, song_ids) with song_ids[column] -> Song.id.
+    """
+    import numpy as np
+    from scipy import sparse
+
+    favorites = User.favorite_songs.through.objects.values_list("user_id", "song_id")
+    in_albums = Album.songs.through.objects.values_list("album__user_id", "song_id")
+
+    pairs = np.array(list(favorites.iterator()) + list(in_albums.iterator()), dtype=np.int64)
+    if not len(pairs):
+        return sparse.csr_matrix((0, 0), dtype=np.float32), np.array([], dtype=np.int64)
+
+    user_ids, rows = np.unique(pairs[:, 0], return_inverse=True)
+    song_ids, cols = np.unique(pairs[:, 1], return_inverse=True)
+
+    matrix = sparse.coo_matrix(
+        (np.ones(len(pairs), dtype=np.float32), (rows, cols)),
+        shape=(len(user_ids), len(song_ids)),
+    ).tocsr()
+    # A song both favorited and in an album counts once
+    matrix.data[:] = 1
+
+    return matrix, song_ids
+
+
+def top_neighbors(matrix, song_ids, columns, k=TOP_K):
+    """
+    Cosine similarity of the co-occurrence counts for `columns`.
+
+    Yields (song_id, [(neighbor_id, score), ...]) best first.
+    """
+    import numpy as np
+
+    norms = np.sqrt(np.asarray(matrix.sum(axis=0)).ravel())
+    transposed = matrix.T.tocsr()
+
+    for start in range(0, len(columns), BLOCK_SIZE):
+        block = columns[start : start + BLOCK_SIZE]
+        cooccurrence = (transposed[block] @ matrix).tocsr()
+
+        for row, column in enumerate(block):
+            lo, hi = cooccurrence.indptr[row], cooccurrence.indptr[row + 1]
+            indices = cooccurrence.indices[lo:hi]
+            scores = cooccurrence.data[lo:hi] / (norms[column] * norms[indices])
+
+            keep = indices != column
+            indices, scores = indices[keep], scores[keep]
+            if len(scores) > k:
+                best = np.argpartition(-scores, k)[:k]
+                indices, scores = indices[best], scores[best]
+
+            order = np.argsort(-scores)
+            yield int(song_ids[column]), [
+                (int(song_ids[i]), float(s)) for i, s in zip(indices[order], scores[order])
+            ]
+
+
+def build_similarity(incremental=False):
+    """
+    Rebuild SongNeighbor, for every song or only the stale ones.
+
+    Returns the number of songs whose neighbours were rewritten.
+    """
+    import numpy as np
+
+    # Songs marked again once the build has started stay stale for the next one
+    started_at = timezone.now()
+    stale = set(StaleSimilarity.objects.values_list("song_id", flat=True))
+    if incremental and not stale:
+        return 0
+
+    matrix, song_ids = interaction_matrix()
+    if incremental:
+        columns = np.flatnonzero(np.isin(song_ids, list(stale)))
+    else:
+        columns = np.arange(len(song_ids))
+
+    written = 0
+    with transaction.atomic():
+        if incremental:
+            SongNeighbor.objects.filter(song_id__in=stale).delete()
+        else:
+            SongNeighbor.objects.all().delete()
+
+        batch = []
+        for song_id, neighbors in top_neighbors(matrix, song_ids, columns):
+            batch += [
+                SongNeighbor(song_id=song_id, neighbor_id=neighbor_id, rank=rank, score=score)
+                for rank, (neighbor_id, score) in enumerate(neighbors, 1)
+            ]
+            written += 1
+            if len(batch) >= 5000:
+                SongNeighbor.objects.bulk_create(batch)
+                batch = []
+        SongNeighbor.objects.bulk_create(batch)
+
+        StaleSimilarity.objects.filter(song_id__in=stale, marked_at__lt=started_at).delete()
+
+    return written
+
+
+def similar_songs(song_id, k=TOP_K):
+    return (
+        Song.objects.ready()
+        .with_related()
+        .filter(neighbor_of__song_id=song_id)
+        .order_by("neighbor_of__rank")[:k]
+    )
+
+
+def recommended_songs(user, k=TOP_K):
+    """Songs most similar to the user's latest favorites, summed over seeds."""
+    seeds = list(
+        User.favorite_songs.through.objects.filter(user=user)
+        .order_by("-id")
+        .values_list("song_id", flat=True)[:SEED_FAVORITES]
+    )
+
+    ranked = (
+        SongNeighbor.objects.filter(song_id__in=seeds)
+        .exclude(neighbor__favorited_by=user)
+        .values("neighbor_id")
+        .annotate(total=Sum("score"))
+        .order_by("-total")[:k]
+    )
+    order = [row["neighbor_id"] for row in ranked]
+    songs = Song.objects.ready().with_related().in_bulk(order)
+
+    return [songs[pk] for pk in order if pk in songs]
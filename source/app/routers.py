@@ -0,0 +1,72 @@
+"""
+Read-replica routing for the public catalog reads.
+
+Only code running inside replica_reads() (SongListAPIView, search,
+artist_detail) reads from the "replica" database; every other read, and
+every write, uses "default", so a user always sees their own changes.
+Without a "replica" entry in DATABASES everything stays on "default".
+"""
+
+import contextvars
+from contextlib import contextmanager
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+
+
+REPLICA = "replica"
+
+use_replica = contextvars.ContextVar("use_replica", default=False)
+
+
+@contextmanager
+def replica_reads():
+    token = use_replica.set(True)
+    try:
+        yield
+    finally:
+        use_replica.reset(token)
+
+
+def reads_from_replica(view):
+    """Decorator for function views (sync or async)."""
+    if iscoroutinefunction(view):
+
+        async def wrapper(*args, **kwargs):
+            with replica_reads():
+                return await view(*args, **kwargs)
+
+    else:
+
+        def wrapper(*args, **kwargs):
+            with replica_reads():
+                return view(*args, **kwargs)
+
+    return wraps(view)(wrapper)
+
+
+class ReplicaReadMixin:
+    """Class-based view counterpart of reads_from_replica."""
+
+    def dispatch(self, request, *args, **kwargs):
+        with replica_reads():
+            return super().dispatch(request, *args, **kwargs)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if use_replica.get() and REPLICA in settings.DATABASES:
+            return REPLICA
+        return None
+
+    def db_for_write(self, model, **hints):
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Same data on both aliases
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema from replication
+        return False if db == REPLICA else None
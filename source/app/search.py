@@ -0,0 +1,129 @@
+import re
+
+from django.db import connections
+from django.db.models import Q
+
+from .models import Song, SongSearchIndex
+
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Column weights for SQLite bm25(): title, artist_name, genre_names, lyrics
+FTS_WEIGHTS = "10.0, 5.0, 2.0, 1.0"
+
+MYSQL_MATCH = (
+    "MATCH (app_songsearchindex.title, app_songsearchindex.artist_name, "
+    "app_songsearchindex.genre_names, app_songsearchindex.lyrics) AGAINST (%s IN BOOLEAN MODE)"
+)
+
+# InnoDB FULLTEXT defaults (innodb_ft_min_token_size, INNODB_FT_DEFAULT_STOPWORD)
+MYSQL_MIN_TOKEN_SIZE = 3
+MYSQL_STOPWORDS = frozenset(
+    "a about an are as at be by com de en for from how i in is it la of on or "
+    "that the this to was what when where who will with und www".split()
+)
+
+
+def tokenize(query):
+    return TOKEN_RE.findall(query.lower())
+
+
+# Song fields that end up in the index document (genres follow m2m_changed)
+INDEXED_FIELDS = frozenset({"title", "artist", "artist_id", "lyrics"})
+
+
+def build_document(song):
+    return {
+        "title": song.title,
+        "artist_name": song.artist.name if song.artist else "",
+        "genre_names": " ".join(genre.name for genre in song.genres.all()),
+        "lyrics": song.lyrics,
+    }
+
+
+def index_song(song):
+    SongSearchIndex.objects.update_or_create(song=song, defaults=build_document(song))
+
+
+def reindex_artist(artist):
+    # The FTS side is kept in sync by triggers / the FULLTEXT index
+    SongSearchIndex.objects.filter(song__artist=artist).update(artist_name=artist.name)
+
+
+def reindex_genre(genre):
+    for song in genre.songs.with_related():
+        index_song(song)
+
+
+def boolean_terms(tokens):
+    """
+    MySQL boolean-mode query requiring every token as a prefix.
+
+    Stopwords and tokens shorter than the minimum token size are not in the
+    FULLTEXT index, so requiring them would match nothing: they are dropped.
+    """
+    return " ".join(
+        f"+{token}*"
+        for token in tokens
+        if len(token) >= MYSQL_MIN_TOKEN_SIZE and token not in MYSQL_STOPWORDS
+    )
+
+
+def contains_all(queryset, tokens):
+    condition = Q()
+    for token in tokens:
+        condition &= (
+            Q(search_index__title__icontains=token)
+            | Q(search_index__artist_name__icontains=token)
+            | Q(search_index__genre_names__icontains=token)
+            | Q(search_index__lyrics__icontains=token)
+        )
+
+    return queryset.filter(condition).order_by("-id")
+
+
+def search_songs(query, queryset=None):
+    """
+    Full-text search over title, artist name, genres and lyrics.
+
+    Returns a Song queryset annotated with `rank` and ordered by relevance.
+    MySQL uses the FULLTEXT index on app_songsearchindex, SQLite the FTS5
+    table app_songsearchindex_fts (joined once, not re-matched per row);
+    other backends fall back to icontains.
+    """
+    if queryset is None:
+        queryset = Song.objects.ready()
+
+    tokens = tokenize(query)
+    if not tokens:
+        return queryset.none()
+
+    vendor = connections[queryset.db].vendor
+
+    if vendor == "mysql":
+        terms = boolean_terms(tokens)
+        if not terms:
+            # Only stopwords / short words: nothing the index can answer
+            return contains_all(queryset, tokens)
+
+        queryset = queryset.extra(
+            select={"rank": MYSQL_MATCH},
+            select_params=[terms],
+            tables=["app_songsearchindex"],
+            where=["app_songsearchindex.song_id = app_song.id", MYSQL_MATCH],
+            params=[terms],
+        )
+
+    elif vendor == "sqlite":
+        terms = " ".join(f'"{token}"*' for token in tokens)
+        queryset = queryset.extra(
+            select={"rank": f"-bm25(app_songsearchindex_fts, {FTS_WEIGHTS})"},
+            tables=["app_songsearchindex_fts"],
+            where=["app_songsearchindex_fts.rowid = app_song.id", "app_songsearchindex_fts MATCH %s"],
+            params=[terms],
+        )
+
+    else:
+        return contains_all(queryset, tokens)
+
+    return queryset.order_by("-rank", "-id")
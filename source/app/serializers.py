@@ -1,23 +1,52 @@
 from rest_framework import serializers
+from rest_framework.reverse import reverse
+from rest_framework_simplejwt import serializers as jwt_serializers
+from .authentication import RefreshToken
+from .images import srcset_map
+from .jobs import enqueue
 from .models import Song, Artist, Genre, Album
 from django.contrib.auth.models import User
 
 
+# Max songs embedded in album/profile payloads, the rest is paginated
+EMBEDDED_SONGS_LIMIT = 10
+
+
 class GenreSerializer(serializers.ModelSerializer):
     class Meta:
         model = Genre
         fields = ["id", "name", "description"]
 
 
+class SrcsetField(serializers.Field):
+    # {MIME type: srcset} of an image's generated variants, null until built
+    def __init__(self, image_field, variants_field, **kwargs):
+        self.image_field = image_field
+        self.variants_field = variants_field
+        super().__init__(source="*", read_only=True, **kwargs)
+
+    def to_representation(self, obj):
+        return srcset_map(
+            getattr(obj, self.image_field),
+            getattr(obj, self.variants_field),
+            self.context.get("request"),
+        )
+
+
 class ArtistSerializer(serializers.ModelSerializer):
+    image_srcset = SrcsetField("image", "image_variants")
+
     class Meta:
         model = Artist
-        fields = ["id", "name", "bio", "image"]
+        fields = ["id", "name", "bio", "image", "image_srcset", "song_count"]
 
 
 class SongSerializer(serializers.ModelSerializer):
+    cover_srcset = SrcsetField("cover_image", "cover_variants")
     artist = ArtistSerializer(read_only=True)
     genres = GenreSerializer(many=True, read_only=True)
+    waveform_url = serializers.SerializerMethodField()
+    hls_url = serializers.SerializerMethodField()
 
     class Meta:
         model = Song
@@ -25,14 +54,69 @@ class SongSerializer(serializers.ModelSerializer):
             "id",
             "title",
             "cover_image",
+            "cover_srcset",
             "audio_file",
             "lyrics",
             "artist",
             "genres",
             "uploaded_by",
+            "favorite_count",
+            "duration",
+            "bitrate",
+            "sample_rate",
+            "file_size",
+            "content_hash",
+            "loudness",
+            "peak",
+            "replay_gain",
+            "status",
+            "waveform_url",
+            "hls_url",
             "created_at",
         ]
 
+    def get_waveform_url(self, obj):
+        if not obj.waveform:
+            return None
+
+        url = reverse("api-song-waveform", kwargs={"pk": obj.pk}, request=self.context.get("request"))
+        # Cached for a year, so the URL changes with the audio
+        return f"{url}?v={obj.content_hash[:12]}"
+
+    def get_hls_url(self, obj):
+        # Null until transcoded; play `audio_file` / the stream endpoint meanwhile
+        if not obj.hls_playlist:
+            return None
+
+        return reverse("api-song-playlist", kwargs={"pk": obj.pk}, request=self.context.get("request"))
+
+
+class ArtistSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Artist
+        fields = ["id", "name"]
+
+
+class SongSummarySerializer(serializers.ModelSerializer):
+    # Compact song for embedded lists: no lyrics, no artist bio
+    cover_srcset = SrcsetField("cover_image", "cover_variants")
+    artist = ArtistSummarySerializer(read_only=True)
+    genres = serializers.SlugRelatedField(many=True, read_only=True, slug_field="name")
+
+    class Meta:
+        model = Song
+        fields = [
+            "id",
+            "title",
+            "cover_image",
+            "cover_srcset",
+            "audio_file",
+            "artist",
+            "genres",
+            "favorite_count",
+            "duration",
+        ]
+
 
 class SongWriteSerializer(serializers.ModelSerializer):
     artist_id = serializers.PrimaryKeyRelatedField(
@@ -52,6 +136,7 @@ class SongWriteSerializer(serializers.ModelSerializer):
             "lyrics",
             "artist_id",
             "genre_ids",
+            "status",
         ]
 
     def create(self, validated_data):
@@ -59,29 +144,78 @@ class SongWriteSerializer(serializers.ModelSerializer):
         song = Song.objects.create(**validated_data)
         if genres:
             song.genres.set(genres)
+        # Metadata is read in the background, status stays "pending" until then
+        enqueue("process_song", song.pk)
         return song
 
     def update(self, instance, validated_data):
         genres = validated_data.pop("genres", None)
+        new_audio = "audio_file" in validated_data
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
+        if new_audio:
+            instance.status = Song.PENDING
         instance.save()
         if genres is not None:
             instance.genres.set(genres)
+        if new_audio:
+            enqueue("process_song", instance.pk)
         return instance
 
 
 class AlbumSerializer(serializers.ModelSerializer):
-    songs = SongSerializer(many=True, read_only=True)
+    songs = serializers.SerializerMethodField()
+    songs_url = serializers.SerializerMethodField()
 
     class Meta:
         model = Album
-        fields = ["id", "name", "songs", "created_at"]
+        fields = ["id", "name", "songs", "song_count", "songs_url", "created_at"]
+        read_only_fields = ["song_count"]
+
+    def get_songs(self, obj):
+        # Prefetched by Album.objects.with_song_preview()
+        songs = getattr(obj, "preview_songs", None)
+        if songs is None:
+            songs = obj.songs.with_related().order_by("-id")[:EMBEDDED_SONGS_LIMIT]
+
+        return SongSummarySerializer(songs, many=True, context=self.context).data
+
+    def get_songs_url(self, obj):
+        return reverse(
+            "api-album-songs",
+            kwargs={"album_id": obj.id},
+            request=self.context.get("request"),
+        )
 
 
 class UserSerializer(serializers.ModelSerializer):
-    favorite_songs = SongSerializer(many=True, read_only=True)
+    favorite_songs = serializers.SerializerMethodField()
+    favorite_songs_count = serializers.SerializerMethodField()
+    favorite_songs_url = serializers.SerializerMethodField()
 
     class Meta:
         model = User
-        fields = ["id", "username", "email", "favorite_songs"]
+        fields = [
+            "id",
+            "username",
+            "email",
+            "favorite_songs",
+            "favorite_songs_count",
+            "favorite_songs_url",
+        ]
+
+    def get_favorite_songs(self, obj):
+        songs = obj.favorite_songs.with_related().order_by("-id")[:EMBEDDED_SONGS_LIMIT]
+
+        return SongSummarySerializer(songs, many=True, context=self.context).data
+
+    def get_favorite_songs_count(self, obj):
+        return obj.favorite_songs.count()
+
+    def get_favorite_songs_url(self, obj):
+        return reverse("api-favorite-songs", request=self.context.get("request"))
+
+
+class TokenRefreshSerializer(jwt_serializers.TokenRefreshSerializer):
+    # Blacklist checked through the Bloom filter (SIMPLE_JWT["TOKEN_REFRESH_SERIALIZER"])
+    token_class = RefreshToken
@@ -0,0 +1,343 @@
+from django.db.models.signals import (
+    post_save,
+    post_delete,
+    pre_save,
+    pre_delete,
+    m2m_changed,
+)
+from django.db import transaction
+from django.db.models import F
+from django.dispatch import receiver
+from django.contrib.auth.models import User
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from .models import Song, Artist, Genre, Album, StaleSimilarity
+from . import search, suggest, trending
+from .authentication import forget_user
+from .caching import bump_version
+from .counters import adjust
+from .images import IMAGE_FIELDS
+from .jobs import enqueue
+
+
+def reindex_songs(song_ids):
+    for song in Song.objects.with_related().filter(pk__in=song_ids):
+        search.index_song(song)
+
+
+# Search index
+@receiver(post_save, sender=Song)
+def index_song_on_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Job saves (status, waveform, loudness, HLS) change nothing searchable
+    if not raw and (update_fields is None or search.INDEXED_FIELDS.intersection(update_fields)):
+        search.index_song(instance)
+
+
+@receiver(m2m_changed, sender=Song.genres.through)
+def index_song_on_genres_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            search.index_song(instance)
+        return
+
+    # genre.songs.clear() does not report which songs it touches
+    if action == "pre_clear":
+        instance._cleared_song_ids = list(instance.songs.values_list("id", flat=True))
+    elif action == "post_clear":
+        reindex_songs(getattr(instance, "_cleared_song_ids", []))
+    elif action in ("post_add", "post_remove"):
+        reindex_songs(pk_set)
+
+
+@receiver(post_save, sender=Artist)
+def index_artist_on_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    # Saving only the generated image variants changes nothing searchable
+    if not raw and not created and update_fields != {"image_variants"}:
+        search.reindex_artist(instance)
+
+
+@receiver(post_save, sender=Genre)
+def index_genre_on_save(sender, instance, created, raw=False, **kwargs):
+    if not raw and not created:
+        search.reindex_genre(instance)
+
+
+@receiver(pre_delete, sender=Genre)
+def remember_genre_songs(sender, instance, **kwargs):
+    instance._deleted_song_ids = list(instance.songs.values_list("id", flat=True))
+
+
+@receiver(post_delete, sender=Genre)
+def index_genre_on_delete(sender, instance, **kwargs):
+    reindex_songs(getattr(instance, "_deleted_song_ids", []))
+
+
+@receiver(pre_delete, sender=Artist)
+def index_artist_on_delete(sender, instance, **kwargs):
+    # Songs keep existing with artist=NULL (SET_NULL skips post_save)
+    search.SongSearchIndex.objects.filter(song__artist=instance).update(artist_name="")
+
+
+# Typeahead index
+def suggest_on_save(label_field, listed=None, watched=()):
+    """
+    Receiver sending the label to the typeahead index, unless neither it nor
+    a `watched` field was saved; instances failing `listed` are removed.
+    """
+    fields = {label_field, *watched}
+
+    def update(sender, instance, raw=False, update_fields=None, **kwargs):
+        if raw or (update_fields is not None and not fields.intersection(update_fields)):
+            return
+
+        label = getattr(instance, label_field) if listed is None or listed(instance) else None
+        suggest.update_entry(sender._meta.model_name, instance.pk, label)
+
+    return update
+
+
+post_save.connect(
+    suggest_on_save("title", listed=lambda song: song.status == Song.READY, watched=["status"]),
+    sender=Song,
+    weak=False,
+    dispatch_uid="suggest_song",
+)
+post_save.connect(suggest_on_save("name"), sender=Artist, weak=False, dispatch_uid="suggest_artist")
+post_save.connect(suggest_on_save("name"), sender=Genre, weak=False, dispatch_uid="suggest_genre")
+
+
+@receiver(post_delete, sender=Song)
+@receiver(post_delete, sender=Artist)
+@receiver(post_delete, sender=Genre)
+def suggest_remove_on_delete(sender, instance, **kwargs):
+    suggest.update_entry(sender._meta.model_name, instance.pk)
+
+
+# Cached genre list (context processor)
+@receiver(post_save, sender=Genre)
+@receiver(post_delete, sender=Genre)
+def invalidate_genres(sender, **kwargs):
+    bump_version("genres")
+
+
+# Catalog page fragments (views.catalog_cache_context)
+@receiver(post_save, sender=Song)
+@receiver(post_delete, sender=Song)
+def invalidate_song_fragments(sender, **kwargs):
+    bump_version("songs")
+    bump_version("catalog")
+
+
+@receiver(m2m_changed, sender=Song.genres.through)
+def invalidate_song_genres(sender, action, **kwargs):
+    # API song payloads embed their genres (ETags, app/conditional.py)
+    if action.startswith("post_"):
+        bump_version("songs")
+
+
+@receiver(post_save, sender=Artist)
+@receiver(post_delete, sender=Artist)
+def invalidate_artist_fragments(sender, **kwargs):
+    # Song cards render the artist name too
+    bump_version("artists")
+    bump_version("songs")
+    bump_version("catalog")
+
+
+@receiver(m2m_changed, sender=User.favorite_songs.through)
+def invalidate_favorite_fragments(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith("post_"):
+        return
+
+    if not reverse:
+        bump_version(f"favorites:{instance.pk}")
+    elif pk_set:
+        for user_id in pk_set:
+            bump_version(f"favorites:{user_id}")
+    else:
+        # song.favorited_by.clear(): no user ids reported
+        bump_version("songs")
+
+
+# JWT authentication (app/authentication.py)
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    forget_user(instance.pk)
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def invalidate_blacklist_filter(sender, created, **kwargs):
+    # Bumped after commit so workers reloading the filter can read the row;
+    # deleted rows only leave harmless false positives behind
+    if created:
+        transaction.on_commit(lambda: bump_version("blacklist"))
+
+
+# Denormalized counters (app/counters.py, `manage.py recount` repairs drift)
+def m2m_counter(counted_model, field):
+    """
+    Receiver keeping `counted_model.field` equal to its number of rows in
+    an m2m through table, from either side of the relation.
+
+    `remove()` reports the requested pks rather than the removed ones and
+    `clear()` reports none, so the real rows are read in pre_remove/pre_clear.
+    """
+
+    def track(sender, instance, action, pk_set, **kwargs):
+        fks = {f.related_model: f.name for f in sender._meta.fields if f.is_relation}
+        instance_fk = fks[instance._meta.concrete_model]
+        other_fk = next(name for name in fks.values() if name != instance_fk)
+        stash = f"_counted_{sender._meta.model_name}"
+
+        if action in ("pre_remove", "pre_clear"):
+            rows = sender.objects.filter(**{instance_fk: instance.pk})
+            if action == "pre_remove":
+                rows = rows.filter(**{f"{other_fk}__in": pk_set})
+            setattr(instance, stash, set(rows.values_list(f"{other_fk}_id", flat=True)))
+            return
+
+        if action == "post_add":
+            pks, delta = pk_set, 1
+        elif action in ("post_remove", "post_clear"):
+            pks, delta = instance.__dict__.pop(stash, pk_set), -1
+        else:
+            return
+
+        if isinstance(instance, counted_model):
+            adjust(counted_model, [instance.pk], field, delta * len(pks or ()))
+        else:
+            adjust(counted_model, pks, field, delta)
+
+    return track
+
+
+@receiver(m2m_changed, sender=User.favorite_songs.through)
+def invalidate_favorite_counts(sender, action, **kwargs):
+    # favorite_count is part of the API song payloads (ETags)
+    if action.startswith("post_"):
+        bump_version("favorite_counts")
+
+
+m2m_changed.connect(
+    m2m_counter(Song, "favorite_count"),
+    sender=User.favorite_songs.through,
+    weak=False,
+    dispatch_uid="song_favorite_count",
+)
+m2m_changed.connect(
+    m2m_counter(Album, "song_count"),
+    sender=Album.songs.through,
+    weak=False,
+    dispatch_uid="album_song_count",
+)
+
+
+@receiver(pre_save, sender=Song)
+def remember_song_artist(sender, instance, raw=False, update_fields=None, **kwargs):
+    if update_fields is not None and not {"artist", "artist_id"}.intersection(update_fields):
+        # The artist column isn't written: nothing to recount
+        instance._previous_artist_id = instance.artist_id
+        return
+
+    instance._previous_artist_id = None
+    if not raw and not instance._state.adding:
+        instance._previous_artist_id = (
+            Song.objects.filter(pk=instance.pk).values_list("artist_id", flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Song)
+def count_artist_songs_on_save(sender, instance, raw=False, **kwargs):
+    previous = getattr(instance, "_previous_artist_id", None)
+    if not raw and previous != instance.artist_id:
+        adjust(Artist, [previous], "song_count", -1)
+        adjust(Artist, [instance.artist_id], "song_count", 1)
+        # Queryset updates send no signals: invalidate the artist payloads here
+        bump_version("artists")
+
+
+@receiver(pre_delete, sender=Song)
+def count_on_song_delete(sender, instance, **kwargs):
+    # Through rows are removed by cascade, without m2m_changed
+    adjust(Artist, [instance.artist_id], "song_count", -1)
+    Album.objects.filter(songs=instance).update(song_count=F("song_count") - 1)
+    bump_version("artists")
+
+
+@receiver(pre_delete, sender=User)
+def count_on_user_delete(sender, instance, **kwargs):
+    Song.objects.filter(favorited_by=instance).update(favorite_count=F("favorite_count") - 1)
+    bump_version("favorite_counts")
+
+
+# Trending charts
+@receiver(m2m_changed, sender=User.favorite_songs.through)
+def record_favorite_activity(sender, instance, action, reverse, pk_set, **kwargs):
+    if action != "post_add" or not pk_set:
+        return
+
+    if reverse:
+        trending.buffer.record(instance.pk, favorites=len(pk_set))
+    else:
+        for song_id in pk_set:
+            trending.buffer.record(song_id, favorites=1)
+
+
+# Similar songs (`manage.py build_similarity --incremental`)
+@receiver(m2m_changed, sender=User.favorite_songs.through)
+@receiver(m2m_changed, sender=Album.songs.through)
+def mark_similarity_stale(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        song_ids = {instance.pk} if action.startswith("post_") else set()
+    elif action == "pre_clear":
+        # Remember the songs before their rows go away
+        owner = next(
+            f.name
+            for f in sender._meta.fields
+            if f.is_relation and f.related_model is instance._meta.concrete_model
+        )
+        instance._stale_song_ids = set(
+            sender.objects.filter(**{owner: instance.pk}).values_list("song_id", flat=True)
+        )
+        return
+    elif action == "post_clear":
+        song_ids = instance.__dict__.pop("_stale_song_ids", set())
+    elif action in ("post_add", "post_remove"):
+        song_ids = pk_set
+    else:
+        return
+
+    StaleSimilarity.objects.bulk_create(
+        [StaleSimilarity(song_id=song_id) for song_id in song_ids or ()],
+        update_conflicts=True,
+        unique_fields=["song"],
+        update_fields=["marked_at"],
+    )
+
+
+# Responsive image variants (app/images.py), built on the job queue
+def queue_image_variants(model_name):
+    image_field, variants_field = IMAGE_FIELDS[model_name]
+
+    def queue(sender, instance, raw=False, **kwargs):
+        # Compared by file name, so re-saves don't queue anything
+        source = getattr(instance, image_field).name or ""
+        if not raw and source != getattr(instance, variants_field).get("source", ""):
+            enqueue("build_image_variants", model_name, instance.pk)
+
+    return queue
+
+
+post_save.connect(
+    queue_image_variants("song"),
+    sender=Song,
+    weak=False,
+    dispatch_uid="song_image_variants",
+)
+post_save.connect(
+    queue_image_variants("artist"),
+    sender=Artist,
+    weak=False,
+    dispatch_uid="artist_image_variants",
+)
@@ -0,0 +1,181 @@
+import asyncio
+import mimetypes
+import re
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.http import http_date, parse_http_date_safe
+
+
+CHUNK_SIZE = 64 * 1024
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def parse_range(header, size):
+    """
+    Parse a single-range `Range: bytes=...` header.
+
+    Returns (start, end) with `end` inclusive, None when the header should be
+    ignored (missing, malformed or multi-range), and raises ValueError when
+    the range cannot be satisfied.
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match:
+        return None
+
+    first, last = match.groups()
+    if not first and not last:
+        return None
+
+    if first:
+        start = int(first)
+        end = int(last) if last else size - 1
+    else:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError("Empty suffix range")
+        start = max(size - length, 0)
+        end = size - 1
+
+    if start >= size or start > end:
+        raise ValueError("Range not satisfiable")
+
+    return start, min(end, size - 1)
+
+
+def file_validators(field_file):
+    """Return (etag, last_modified timestamp) for a stored file."""
+    size = field_file.size
+    try:
+        modified = int(field_file.storage.get_modified_time(field_file.name).timestamp())
+    except (NotImplementedError, OSError):
+        modified = None
+
+    etag = f'"{size:x}-{modified or 0:x}"'
+    return etag, modified
+
+
+def if_range_matches(request, etag, modified):
+    """Check `If-Range` against the current representation."""
+    if_range = request.headers.get("If-Range")
+    if not if_range:
+        return True
+
+    if if_range.startswith(('"', "W/")):
+        # Weak validators never match If-Range
+        return if_range == etag
+
+    since = parse_http_date_safe(if_range)
+    return since is not None and modified is not None and modified <= since
+
+
+def read_chunks(field_file, start, length):
+    with field_file.open("rb") as f:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            data = f.read(min(CHUNK_SIZE, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+
+
+async def aread_chunks(field_file, start, length):
+    """
+    Async version of read_chunks for ASGI: each read runs in a worker
+    thread, so a slow client holds no thread between chunks.
+    """
+    f = await asyncio.to_thread(field_file.storage.open, field_file.name, "rb")
+    try:
+        await asyncio.to_thread(f.seek, start)
+        remaining = length
+        while remaining > 0:
+            data = await asyncio.to_thread(f.read, min(CHUNK_SIZE, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+    finally:
+        await asyncio.to_thread(f.close)
+
+
+def offload_response(field_file):
+    """
+    Hand the transfer over to the reverse proxy.
+
+    STREAMING_OFFLOAD = "accel" -> nginx X-Accel-Redirect (internal location)
+    STREAMING_OFFLOAD = "sendfile" -> Apache/lighttpd X-Sendfile (absolute path)
+    """
+    mode = getattr(settings, "STREAMING_OFFLOAD", None)
+    response = HttpResponse()
+    response["Content-Type"] = mimetypes.guess_type(field_file.name)[0] or "application/octet-stream"
+
+    if mode == "accel":
+        prefix = getattr(settings, "STREAMING_ACCEL_PREFIX", "/protected-media/")
+        response["X-Accel-Redirect"] = prefix.rstrip("/") + "/" + field_file.name
+    else:
+        response["X-Sendfile"] = field_file.path
+
+    return response
+
+
+def stream_file(request, field_file, asynchronous=False):
+    """
+    Serve a FieldFile with HTTP Range / If-Range support.
+
+    Whole-file requests use FileResponse so the WSGI server can use its
+    zero-copy `wsgi.file_wrapper` (sendfile); partial requests stream the
+    requested byte window in chunks and answer 206 Partial Content.
+
+    With `asynchronous=True` (ASGI views) the body is an async iterator
+    (aread_chunks) in both cases. A missing file raises Http404.
+    """
+    if not field_file:
+        raise Http404("No file")
+
+    if getattr(settings, "STREAMING_OFFLOAD", None):
+        # The proxy handles Range itself
+        return offload_response(field_file)
+
+    try:
+        size = field_file.size
+    except OSError:
+        raise Http404("File not found")
+    etag, modified = file_validators(field_file)
+    content_type = mimetypes.guess_type(field_file.name)[0] or "application/octet-stream"
+
+    byte_range = None
+    if if_range_matches(request, etag, modified):
+        try:
+            byte_range = parse_range(request.headers.get("Range"), size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            response["Accept-Ranges"] = "bytes"
+            return response
+
+    if byte_range is None and asynchronous:
+        response = StreamingHttpResponse(aread_chunks(field_file, 0, size), content_type=content_type)
+        response["Content-Length"] = size
+    elif byte_range is None:
+        response = FileResponse(field_file.open("rb"), content_type=content_type)
+    else:
+        start, end = byte_range
+        length = end - start + 1
+        response = StreamingHttpResponse(
+            (aread_chunks if asynchronous else read_chunks)(field_file, start, length),
+            status=206,
+            content_type=content_type,
+        )
+        response["Content-Length"] = length
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+    response["Accept-Ranges"] = "bytes"
+    response["ETag"] = etag
+    if modified is not None:
+        response["Last-Modified"] = http_date(modified)
+
+    return response
@@ -0,0 +1,187 @@
+import time
+import threading
+import unicodedata
+from bisect import bisect_left
+
+from django.core.cache import cache
+
+from .models import Song, Artist, Genre
+
+
+# Snapshot (version, {(kind, pk): label}), written only on a rebuild from the database
+ENTRIES_KEY = "suggest:entries"
+# Number of the last change; change n is stored alone under CHANGE_KEY
+VERSION_KEY = "suggest:version"
+CHANGE_KEY = "suggest:change:{}"
+CHANGE_TTL = 24 * 60 * 60
+
+# How often a worker checks the shared cache for newer changes
+REFRESH_SECONDS = 5
+# Further behind than this, a worker rebuilds instead of replaying
+MAX_REPLAY = 1000
+
+# Candidates scanned per lookup before ranking
+MAX_SCAN = 200
+
+KINDS = {"song": Song, "artist": Artist, "genre": Genre}
+
+
+def normalize(text):
+    # "Lạc Trôi" -> "lac troi"
+    text = text.casefold().replace("đ", "d")
+    text = unicodedata.normalize("NFKD", text)
+
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+class PrefixIndex:
+    """
+    Sorted array of normalized keys, one per word start of every label,
+    so "lo" matches both "Love Story" and "Crazy in Love".
+    """
+
+    def __init__(self, entries):
+        self.labels = dict(entries)
+        items = [item for entry, label in self.labels.items() for item in self.entry_items(entry, label)]
+
+        items.sort()
+        self.keys = [item[0] for item in items]
+        self.items = items
+
+    @staticmethod
+    def entry_items(entry, label):
+        kind, pk = entry
+        words = normalize(label).split()
+
+        return [(" ".join(words[position:]), position, kind, pk, label) for position in range(len(words))]
+
+    def set(self, kind, pk, label=None):
+        """Apply one change in place; `label=None` removes the entry."""
+        old = self.labels.pop((kind, pk), None)
+        if old is not None:
+            for item in self.entry_items((kind, pk), old):
+                position = bisect_left(self.items, item)
+                if position < len(self.items) and self.items[position] == item:
+                    del self.items[position]
+                    del self.keys[position]
+
+        if label is not None:
+            self.labels[(kind, pk)] = label
+            for item in self.entry_items((kind, pk), label):
+                position = bisect_left(self.items, item)
+                self.items.insert(position, item)
+                self.keys.insert(position, item[0])
+
+    def lookup(self, prefix, limit):
+        prefix = " ".join(normalize(prefix).split())
+        if not prefix:
+            return {kind: [] for kind in KINDS}
+
+        start = bisect_left(self.keys, prefix)
+        end = bisect_left(self.keys, prefix + "\uffff", lo=start)
+        candidates = self.items[start : min(end, start + MAX_SCAN)]
+
+        # Whole-label matches first, then shorter labels
+        candidates = sorted(candidates, key=lambda item: (item[1] > 0, len(item[4]), item[4]))
+
+        results = {kind: [] for kind in KINDS}
+        seen = set()
+        for _, _, kind, pk, label in candidates:
+            if (kind, pk) in seen or len(results[kind]) >= limit:
+                continue
+            seen.add((kind, pk))
+            results[kind].append({"id": pk, "name": label})
+
+        return results
+
+
+def load_entries():
+    entries = {}
+    for pk, title in Song.objects.ready().values_list("id", "title").iterator():
+        entries[("song", pk)] = title
+    for pk, name in Artist.objects.values_list("id", "name").iterator():
+        entries[("artist", pk)] = name
+    for pk, name in Genre.objects.values_list("id", "name").iterator():
+        entries[("genre", pk)] = name
+
+    return entries
+
+
+class _LocalIndex:
+    """
+    This worker's PrefixIndex, kept current by replaying the shared change
+    log; it is only rebuilt (from the snapshot, else the database) when it
+    falls too far behind or a change has expired.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.index = None
+        self.version = 0
+        self.checked_at = 0.0
+        self.stalled_at = None
+
+    def refresh(self):
+        now = time.monotonic()
+        if self.index is not None and now - self.checked_at < REFRESH_SECONDS:
+            return
+
+        version = cache.get(VERSION_KEY, 0)
+        if self.index is None or not self.replay(version):
+            self.rebuild()
+        self.checked_at = now
+
+    def replay(self, version):
+        if not self.version <= version <= self.version + MAX_REPLAY:
+            return False
+
+        numbers = range(self.version + 1, version + 1)
+        changes = cache.get_many([CHANGE_KEY.format(number) for number in numbers])
+        for number in numbers:
+            change = changes.get(CHANGE_KEY.format(number))
+            if change is None:
+                # Counted by incr() but not stored yet, or evicted: wait one refresh
+                if self.stalled_at == number:
+                    return False
+                self.stalled_at = number
+                return True
+            self.index.set(*change)
+            self.version = number
+
+        return True
+
+    def rebuild(self):
+        snapshot = cache.get(ENTRIES_KEY)
+        if snapshot is not None:
+            self.version, self.index = snapshot[0], PrefixIndex(snapshot[1])
+            if self.replay(cache.get(VERSION_KEY, 0)):
+                return
+
+        # Changes counted after this read are replayed over the loaded rows
+        version = cache.get(VERSION_KEY, 0)
+        entries = load_entries()
+        cache.set(ENTRIES_KEY, (version, entries), None)
+        self.version, self.index = version, PrefixIndex(entries)
+        self.stalled_at = None
+
+
+_local = _LocalIndex()
+
+
+def suggest(prefix, limit=5):
+    with _local.lock:
+        _local.refresh()
+        return _local.index.lookup(prefix, limit)
+
+
+def update_entry(kind, pk, label=None):
+    """Record a single change for every worker; `label=None` removes it."""
+    try:
+        version = cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, 0, None)
+        version = cache.incr(VERSION_KEY)
+    cache.set(CHANGE_KEY.format(version), (kind, pk, label), CHANGE_TTL)
+
+    # This worker sees its own change immediately
+    _local.checked_at = 0.0
@@ -0,0 +1,123 @@
+"""Background tasks for uploads, run by `manage.py runworker` (see app/jobs.py)."""
+
+import logging
+import os
+import shutil
+
+from django.apps import apps
+
+from .audio import InvalidAudio, ffmpeg_binary, read_audio_metadata
+from . import suggest
+from .caching import bump_version
+from .hls import delete_tree, transcode
+from .images import IMAGE_FIELDS, generate_variants
+from .jobs import enqueue, task
+from .loudness import analyze
+from .models import Song
+from .waveform import build_waveform
+
+
+logger = logging.getLogger(__name__)
+
+
+def mark_song_failed(song_id):
+    Song.objects.filter(pk=song_id).update(status=Song.FAILED)
+    # update() sends no post_save: invalidate the song payloads (ETags) and
+    # drop the song from the typeahead index here
+    bump_version("songs")
+    suggest.update_entry("song", song_id)
+
+
+@task(max_attempts=3, on_failure=mark_song_failed)
+def process_song(song_id):
+    song = Song.objects.filter(pk=song_id).first()
+    if song is None:
+        # Deleted before the worker got to it
+        return
+
+    try:
+        with song.audio_file.open("rb") as f:
+            metadata = read_audio_metadata(f)
+    except InvalidAudio:
+        # Retrying won't help
+        mark_song_failed(song_id)
+        return
+
+    for attr, value in metadata.items():
+        setattr(song, attr, value)
+    song.status = Song.READY
+    song.save(update_fields=[*metadata, "status", "updated_at"])
+
+    enqueue("build_song_waveform", song_id)
+    enqueue("analyze_song_loudness", song_id)
+    enqueue("transcode_song_hls", song_id)
+
+
+@task(max_attempts=3)
+def build_song_waveform(song_id):
+    song = Song.objects.filter(pk=song_id).first()
+    if song is None:
+        return
+    if not shutil.which(ffmpeg_binary()):
+        logger.warning("ffmpeg not found, skipping the waveform of song %s", song_id)
+        return
+
+    build_waveform(song)
+    song.save(update_fields=["waveform", "updated_at"])
+
+
+@task(max_attempts=3)
+def analyze_song_loudness(song_id):
+    song = Song.objects.filter(pk=song_id).first()
+    if song is None:
+        return
+    if not shutil.which(ffmpeg_binary()):
+        logger.warning("ffmpeg not found, skipping the loudness of song %s", song_id)
+        return
+
+    result = analyze(song.audio_file.path)
+    for attr, value in result.items():
+        setattr(song, attr, value)
+    song.save(update_fields=[*result, "updated_at"])
+
+
+@task(max_attempts=3)
+def build_image_variants(model_name, pk):
+    model = apps.get_model("app", model_name)
+    obj = model.objects.filter(pk=pk).first()
+    if obj is None:
+        return
+
+    image_field, variants_field = IMAGE_FIELDS[model_name]
+    field_file = getattr(obj, image_field)
+    if not field_file:
+        variants = {}
+    elif getattr(obj, variants_field).get("source") == field_file.name:
+        # Already built (the job was queued twice)
+        return
+    else:
+        variants = generate_variants(field_file)
+
+    setattr(obj, variants_field, variants)
+    update_fields = [variants_field]
+    if model is Song:
+        update_fields.append("updated_at")
+    obj.save(update_fields=update_fields)
+
+
+@task(max_attempts=3)
+def transcode_song_hls(song_id):
+    song = Song.objects.filter(pk=song_id).first()
+    if song is None:
+        return
+    if not shutil.which(ffmpeg_binary()):
+        logger.warning("ffmpeg not found, song %s stays progressive-only", song_id)
+        return
+
+    previous = song.hls_playlist
+    song.hls_playlist = transcode(song)
+    song.save(update_fields=["hls_playlist", "updated_at"])
+
+    # The old renditions were served until the new ones were complete
+    if previous and previous != song.hls_playlist:
+        delete_tree(song.audio_file.storage, os.path.dirname(previous))
@@ -0,0 +1,35 @@
+from django import template
+from django.templatetags.static import static
+
+from ..images import srcset_map
+
+
+register = template.Library()
+
+# Shown instead of a missing cover or artist image
+PLACEHOLDER = "images/logo-IT.png"
+
+
+@register.inclusion_tag("partials/picture.html")
+def picture(field_file, variants, sizes, alt="", css_class="", style="", width=None, height=None):
+    """
+    <picture> with AVIF/WebP sources and a JPEG srcset on the <img>; the
+    original upload stays as src until the variants are built, the static
+    placeholder stands in when there is no upload at all.
+
+    {% picture song.cover_image song.cover_variants "60px" alt=song.title %}
+    """
+    srcsets = srcset_map(field_file, variants) or {}
+    fallback = srcsets.pop("image/jpeg", "")
+
+    return {
+        "src": field_file.url if field_file else static(PLACEHOLDER),
+        "sources": srcsets.items(),
+        "fallback": fallback,
+        "sizes": sizes,
+        "alt": alt,
+        "css_class": css_class,
+        "style": style,
+        "width": width,
+        "height": height,
+    }
@@ -1,3 +1,1261 @@
-from django.test import TestCase
+import os
+import sys
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import skipUnless
+from unittest.mock import patch
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.cache import cache, caches
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DatabaseError, connections
+from django.db.models import F, Sum
+from django.template import Context, Template
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework.test import APIClient
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import (
+    api_views,
+    authentication,
+    hls,
+    jobs,
+    loudness,
+    membership,
+    recommendations,
+    suggest,
+    trending,
+    waveform,
+)
+from .audio import InvalidAudio, decode_pcm, read_audio_metadata
+from .authentication import BlacklistFilter, CachedJWTAuthentication, validated_tokens
+from .bloom import BloomFilter
+from .caching import bump_version, get_or_set, jittered, local_cache, version_key
+from .context_processors import global_data
+
+from .management.commands.explain_views import bounded, full_scans, sorts
+from .membership import add_members, remove_members, toggle_member
+from .models import Song, Artist, Genre, Album, Job, SongActivity, SongNeighbor, StaleSimilarity
+from .routers import ReplicaRouter, replica_reads
+from .search import boolean_terms, search_songs
+from .tasks import mark_song_failed
+from .serializers import EMBEDDED_SONGS_LIMIT, ArtistSerializer
+
+
+# MPEG1 Layer III, 128 kbps, 44.1 kHz: 417-byte frames of 1152 samples
+MP3_FRAME = bytes([0xFF, 0xFB, 0x90, 0x00]) + bytes(413)
+
+
+def create_songs(count, artist=None, genres=()):
+    songs = []
+    for i in range(count):
+        song = Song.objects.create(
+            title=f"Song {i}",
+            audio_file=f"songs/song-{i}.mp3",
+            artist=artist,
+            status=Song.READY,
+        )
+        song.genres.set(genres)
+        songs.append(song)
+
+    return songs
+
+
+class SongListQueryBudgetTests(TestCase):
+    # Numbered pages: COUNT(*) + songs JOIN artist/user + genres prefetch
+    QUERIES_PER_PAGE = 3
+    # Keyset pages skip the COUNT(*)
+    QUERIES_PER_KEYSET_PAGE = 2
+
+    def setUp(self):
+        self.client = APIClient()
+        self.genres = [
+            Genre.objects.create(name="Pop"),
+            Genre.objects.create(name="Rock"),
+        ]
+
+    def make_catalog(self, count):
+        artists = [Artist.objects.create(name=f"Artist {i}") for i in range(count)]
+        for artist in artists:
+            create_songs(1, artist=artist, genres=self.genres)
+
+    def test_song_list_query_count_is_constant(self):
+        self.make_catalog(2)
+        with self.assertNumQueries(self.QUERIES_PER_PAGE):
+            self.client.get(reverse("api-song-list"), {"page": 1})
+
+        self.make_catalog(20)
+        with self.assertNumQueries(self.QUERIES_PER_PAGE):
+            response = self.client.get(reverse("api-song-list"), {"page": 1})
+
+        self.assertEqual(len(response.data["results"]), 20)
+
+    def test_numbered_pages_stay_the_default(self):
+        self.make_catalog(2)
+
+        response = self.client.get(reverse("api-song-list"))
+
+        self.assertEqual(response.data["count"], 2)
+        self.assertIn("previous", response.data)
+
+    def test_keyset_pages_cost_the_same(self):
+        self.make_catalog(45)
+        url = reverse("api-song-list") + "?cursor="
+
+        seen = []
+        while url:
+            with self.assertNumQueries(self.QUERIES_PER_KEYSET_PAGE):
+                response = self.client.get(url)
+            seen += [song["id"] for song in response.data["results"]]
+            url = response.data["next"]
+
+        self.assertNotIn("count", response.data)
+        self.assertEqual(seen, list(Song.objects.order_by("-created_at", "-id").values_list("id", flat=True)))
+
+    def test_admin_song_list_query_count_is_constant(self):
+        admin = User.objects.create_user("admin", password="pass", is_staff=True)
+        self.client.force_authenticate(admin)
+        self.make_catalog(20)
+
+        with self.assertNumQueries(self.QUERIES_PER_KEYSET_PAGE):
+            self.client.get(reverse("api-admin-songs"), {"cursor": ""})
+
+    def test_favorite_list_query_count_is_constant(self):
+        user = User.objects.create_user("fan", password="pass")
+        self.client.force_authenticate(user)
+        self.make_catalog(20)
+        user.favorite_songs.set(Song.objects.all())
+
+        with self.assertNumQueries(self.QUERIES_PER_PAGE):
+            self.client.get(reverse("api-favorite-songs"))
+
+
+class ExplainViewsTests(TestCase):
+    def test_every_list_view_passes_without_users(self):
+        out = StringIO()
+
+        call_command("explain_views", "--fail", stdout=out)
+
+        self.assertNotIn("SCAN", out.getvalue())
+        # DRF-only views (query_params) and per-user views are explained too
+        self.assertIn("ok    /api/songs/trending/", out.getvalue())
+        self.assertIn("ok    /api/songs/favorites/", out.getvalue())
+
+    def test_plan_parsing(self):
+        plan = "2 0 0 SCAN app_song\n5 0 0 USE TEMP B-TREE FOR ORDER BY"
+
+        self.assertEqual(full_scans(plan, "sqlite"), ["app_song"])
+        self.assertEqual(full_scans("3 0 0 SCAN app_song USING INDEX song_created_id_idx", "sqlite"), [])
+        self.assertTrue(sorts(plan, "sqlite"))
+        self.assertFalse(bounded(Genre.objects.filter(name="Pop"), "SCAN app_genre", "sqlite"))
+        self.assertTrue(bounded(Genre.objects.all(), "SCAN app_genre", "sqlite"))
+
+
+class ProfilePayloadTests(TestCase):
+    def test_profile_embeds_bounded_favorites(self):
+        user = User.objects.create_user("fan", password="pass")
+        user.favorite_songs.set(create_songs(EMBEDDED_SONGS_LIMIT + 5))
+        client = APIClient()
+        client.force_authenticate(user)
+
+        # favorites slice + genres prefetch + count
+        with self.assertNumQueries(3):
+            response = client.get(reverse("api-profile"))
+
+        self.assertEqual(len(response.data["favorite_songs"]), EMBEDDED_SONGS_LIMIT)
+        self.assertEqual(response.data["favorite_songs_count"], EMBEDDED_SONGS_LIMIT + 5)
+        self.assertNotIn("lyrics", response.data["favorite_songs"][0])
+
+
+class FullTextSearchTests(TestCase):
+    def setUp(self):
+        self.artist = Artist.objects.create(name="Moonlight")
+        self.in_title = Song.objects.create(title="Ocean eyes", audio_file="songs/a.mp3", status=Song.READY)
+        self.in_lyrics = Song.objects.create(
+            title="Other",
+            audio_file="songs/b.mp3",
+            lyrics="waves of the ocean",
+            artist=self.artist,
+            status=Song.READY,
+        )
+
+    def test_title_matches_rank_above_lyrics_matches(self):
+        results = list(search_songs("ocean"))
+
+        self.assertEqual(results, [self.in_title, self.in_lyrics])
+        self.assertGreater(results[0].rank, results[1].rank)
+
+    def test_prefix_and_all_tokens_required(self):
+        self.assertEqual(list(search_songs("oce wav")), [self.in_lyrics])
+        self.assertEqual(list(search_songs("")), [])
+
+    def test_artist_rename_is_reindexed(self):
+        self.artist.name = "Sunrise"
+        self.artist.save()
+
+        self.assertEqual(list(search_songs("sunrise")), [self.in_lyrics])
+        self.assertEqual(list(search_songs("moonlight")), [])
+
+    def test_mysql_terms_skip_stopwords_and_short_tokens(self):
+        self.assertEqual(boolean_terms(["the", "go", "ocean", "with"]), "+ocean*")
+        self.assertEqual(boolean_terms(["of", "a"]), "")
+
+
+class SearchSuggestTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = patch.object(suggest, "_local", suggest._LocalIndex())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        artist = Artist.objects.create(name="Sơn Tùng M-TP")
+        create_songs(1, artist=artist)
+        Song.objects.create(
+            title="Lạc Trôi", audio_file="songs/lac-troi.mp3", artist=artist, status=Song.READY
+        )
+
+    def test_suggest_matches_word_prefix_without_queries(self):
+        url = reverse("api-search-suggest")
+        self.client.get(url, {"q": "warm-up"})
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, {"q": "troi"})
+
+        self.assertEqual([s["name"] for s in response.data["songs"]], ["Lạc Trôi"])
+
+    def test_suggest_follows_model_changes(self):
+        url = reverse("api-search-suggest")
+        self.client.get(url, {"q": "son"})
+        Genre.objects.create(name="Ballad")
+
+        response = self.client.get(url, {"q": "bal"})
+
+        self.assertEqual([g["name"] for g in response.data["genres"]], ["Ballad"])
+
+    def test_saves_without_the_label_record_no_change(self):
+        song = Song.objects.get(title="Lạc Trôi")
+        version = cache.get(suggest.VERSION_KEY)
+
+        song.save(update_fields=["lyrics"])
+
+        self.assertEqual(cache.get(suggest.VERSION_KEY), version)
+
+    def test_only_ready_songs_are_suggested(self):
+        song = Song.objects.get(title="Lạc Trôi")
+        mark_song_failed(song.id)
+        self.assertEqual(suggest.suggest("lac")["song"], [])
+
+        song.status = Song.READY
+        song.save(update_fields=["status"])
+
+        self.assertEqual(suggest.suggest("lac")["song"], [{"id": song.pk, "name": "Lạc Trôi"}])
+
+    def test_changes_from_other_workers_are_replayed_not_rebuilt(self):
+        suggest.suggest("warm-up")
+        song = Song.objects.get(title="Lạc Trôi")
+        # Two workers' saves, each stored as its own change
+        suggest.update_entry("song", song.pk, "Chạy Ngay Đi")
+        suggest.update_entry("genre", 999, "Ballad")
+
+        with patch.object(suggest, "load_entries", side_effect=AssertionError), self.assertNumQueries(0):
+            songs = suggest.suggest("chay")["song"]
+            genres = suggest.suggest("bal")["genre"]
+
+        self.assertEqual(songs, [{"id": song.pk, "name": "Chạy Ngay Đi"}])
+        self.assertEqual(genres, [{"id": 999, "name": "Ballad"}])
+        self.assertEqual(suggest.suggest("troi")["song"], [])
+
+    def test_prefix_index_changes_match_a_rebuild(self):
+        entries = {("song", 1): "Love Story", ("artist", 2): "Crazy in Love"}
+        index = suggest.PrefixIndex(entries)
+
+        index.set("song", 1, "Lover")
+        index.set("artist", 2)
+        index.set("genre", 3, "Love Songs")
+
+        rebuilt = suggest.PrefixIndex({("song", 1): "Lover", ("genre", 3): "Love Songs"})
+        self.assertEqual(index.items, rebuilt.items)
+        self.assertEqual(index.keys, rebuilt.keys)
+
+
+class GenreContextProcessorTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        Genre.objects.create(name="Pop")
+
+    def test_genres_are_lazy_and_cached(self):
+        with self.assertNumQueries(0):
+            context = global_data(None)
+
+        with self.assertNumQueries(1):
+            self.assertEqual([g.name for g in context["genres"]], ["Pop"])
+
+        with self.assertNumQueries(0):
+            list(global_data(None)["genres"])
+
+    def test_genre_save_invalidates_cache(self):
+        list(global_data(None)["genres"])
+        Genre.objects.create(name="Rock")
+
+        names = sorted(g.name for g in global_data(None)["genres"])
+
+        self.assertEqual(names, ["Pop", "Rock"])
+
+    def test_lost_version_key_is_not_reseeded_with_an_old_value(self):
+        list(global_data(None)["genres"])
+        Genre.objects.create(name="Rock")
+        # Evicted (or the cache restarted) after the bump
+        cache.delete(version_key("genres"))
+        local_cache.clear()
+
+        names = sorted(g.name for g in global_data(None)["genres"])
+
+        self.assertEqual(names, ["Pop", "Rock"])
+
+
+class GetOrSetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.store = caches["querysets"]
+
+    def test_loader_runs_once_and_none_is_cached(self):
+        calls = []
+
+        def load():
+            calls.append(1)
+            return None
+
+        self.assertIsNone(get_or_set("key", load, 60))
+        self.assertIsNone(get_or_set("key", load, 60))
+        self.assertEqual(len(calls), 1)
+
+    def test_waits_for_the_worker_holding_the_lock(self):
+        self.store.add("lock:key", 1)
+
+        def other_worker_finishes(seconds):
+            self.store.set("key", "shared")
+
+        with patch("app.caching.time.sleep", side_effect=other_worker_finishes):
+            value = get_or_set("key", lambda: self.fail("loader must not run"))
+
+        self.assertEqual(value, "shared")
+
+    def test_a_waiter_takes_over_when_the_loader_fails(self):
+        self.store.add("lock:key", "other")
+
+        def other_worker_fails(seconds):
+            self.store.delete("lock:key")
+
+        with patch("app.caching.time.sleep", side_effect=other_worker_fails) as sleep:
+            value = get_or_set("key", lambda: "own")
+
+        self.assertEqual((value, sleep.call_count), ("own", 1))
+        self.assertEqual(self.store.get("key"), "own")
+        self.assertIsNone(self.store.get("lock:key"))
+
+    def test_an_expired_holder_keeps_the_new_holders_lock(self):
+        def slow_load():
+            # Our lock expired and another worker took it meanwhile
+            self.store.set("lock:key", "other")
+            return "own"
+
+        self.assertEqual(get_or_set("key", slow_load), "own")
+        self.assertEqual(self.store.get("lock:key"), "other")
+
+    def test_loads_itself_when_the_lock_is_stale(self):
+        self.store.add("lock:key", 1)
+
+        self.assertEqual(get_or_set("key", lambda: "own", lock_timeout=0), "own")
+
+    def test_timeouts_are_jittered_upwards(self):
+        timeouts = {jittered(600) for _ in range(50)}
+
+        self.assertTrue(all(600 <= t <= 660 for t in timeouts))
+        self.assertGreater(len(timeouts), 1)
+        self.assertIsNone(jittered(None))
+
+
+class CatalogFragmentCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        self.artist = Artist.objects.create(name="Artist")
+        create_songs(3, artist=self.artist)
+
+    def test_anonymous_index_is_served_from_cache(self):
+        self.client.get(reverse("index"))
+
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("index"))
+
+        self.assertContains(response, "Song 2")
+
+    def test_new_song_invalidates_fragments(self):
+        self.client.get(reverse("index"))
+        Song.objects.create(
+            title="Fresh", audio_file="songs/fresh.mp3", artist=self.artist, status=Song.READY
+        )
+
+        response = self.client.get(reverse("index"))
+
+        self.assertContains(response, "Fresh")
+
+    def test_index_renders_only_the_newest_artists(self):
+        for i in range(7):
+            Artist.objects.create(name=f"Newcomer {i}")
+
+        response = self.client.get(reverse("index"))
+
+        self.assertEqual(len(response.context["artists"]), 5)
+        self.assertContains(response, "Newcomer 6")
+        self.assertNotContains(response, "Newcomer 1")
+
+
+class SessionQueryTests(TestCase):
+    PAGES = ["index", "songs", "artists"]
+
+    def setUp(self):
+        cache.clear()
+        create_songs(3, artist=Artist.objects.create(name="Artist"))
+        User.objects.create_user(username="listener", password="pass-12345")
+
+    def session_queries(self, client):
+        counts = []
+        for name in self.PAGES:
+            client.get(reverse(name))
+            with CaptureQueriesContext(connections["default"]) as queries:
+                response = client.get(reverse(name))
+            self.assertEqual(response.status_code, 200)
+            counts.append(sum("django_session" in q["sql"] for q in queries))
+
+        return counts
+
+    def test_anonymous_pages_never_touch_the_session_store(self):
+        response = self.client.get(reverse("index"))
+
+        self.assertEqual(self.session_queries(self.client), [0, 0, 0])
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
+
+    def test_cached_sessions_save_a_query_per_logged_in_page(self):
+        for engine, expected in [("db", [1, 1, 1]), ("cached_db", [0, 0, 0])]:
+            with override_settings(SESSION_ENGINE=f"django.contrib.sessions.backends.{engine}"):
+                client = Client()
+                client.login(username="listener", password="pass-12345")
+                self.assertEqual(self.session_queries(client), expected)
+
+    def test_flash_messages_do_not_write_the_session(self):
+        self.client.login(username="listener", password="pass-12345")
+
+        response = self.client.post(reverse("album_create"), {"name": "Road trip"})
+
+        self.assertIn("messages", response.cookies)
+        self.assertNotIn("_messages", self.client.session)
+
+
+# One test process: LocMem is as shared as Redis would be
+@patch("app.conditional.is_shared", lambda using="default": True)
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        create_songs(3, artist=Artist.objects.create(name="Artist"))
+
+    def test_process_local_cache_sends_no_etag(self):
+        url = reverse("api-song-list")
+
+        with patch("app.conditional.is_shared", return_value=False):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH='W/"anything"')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("ETag", response)
+
+    def test_matching_etag_returns_304_without_queries(self):
+        url = reverse("api-song-list")
+        etag = self.client.get(url)["ETag"]
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_changes_when_songs_change(self):
+        url = reverse("api-song-list")
+        etag = self.client.get(url)["ETag"]
+        create_songs(1)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_song_detail_follows_related_and_queryset_changes(self):
+        song = Song.objects.first()
+        url = reverse("api-song-detail", args=[song.id])
+        response = self.client.get(url)
+        self.assertNotIn("Last-Modified", response)
+
+        song.artist.name = "Renamed"
+        song.artist.save()
+        renamed = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(renamed.status_code, 200)
+
+        mark_song_failed(song.id)
+        failed = self.client.get(url, HTTP_IF_NONE_MATCH=renamed["ETag"])
+        self.assertNotEqual(failed.status_code, 304)
+
+
+class MembershipToggleTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("fan", password="pass")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.songs = create_songs(3)
+
+    def test_toggle_favorite_is_constant_cost(self):
+        self.user.favorite_songs.set(self.songs[1:])
+        url = reverse("api-toggle-favorite", args=[self.songs[0].id])
+
+        # song lookup + DELETE + INSERT + favorite_count UPDATE + stale similarity mark
+        with self.assertNumQueries(5):
+            response = self.client.post(url)
+        self.assertTrue(response.data["is_favorite"])
+
+        # song lookup + DELETE + favorite_count UPDATE + stale similarity mark
+        with self.assertNumQueries(4):
+            response = self.client.post(url)
+        self.assertFalse(response.data["is_favorite"])
+        self.assertEqual(self.user.favorite_songs.count(), 2)
+
+    def test_bulk_add_songs_to_album(self):
+        album = Album.objects.create(name="Mix", user=self.user)
+        album.songs.add(self.songs[0])
+        ids = [song.id for song in self.songs] + [999999]
+
+        response = self.client.post(
+            reverse("api-album-songs", args=[album.id]), {"song_ids": ids}, format="json"
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["added"], sorted(s.id for s in self.songs[1:]))
+        self.assertEqual(album.songs.count(), 3)
+
+    def race(self, insert):
+        """write_rows() where another request changes the same row first."""
+        real = membership.write_rows
+        through = User.favorite_songs.through
+
+        def racing(*args, **kwargs):
+            if kwargs["insert"] == insert:
+                # The other request's write (its own signal is not part of this test)
+                if insert:
+                    through.objects.create(user=self.user, song=self.songs[0])
+                else:
+                    through.objects.filter(user=self.user, song=self.songs[0]).delete()
+            return real(*args, **kwargs)
+
+        return patch.object(membership, "write_rows", side_effect=racing)
+
+    def test_racing_adds_are_reported_once(self):
+        with self.race(insert=True):
+            self.assertTrue(toggle_member(self.user, "favorite_songs", self.songs[0].id))
+        User.favorite_songs.through.objects.all().delete()
+        with self.race(insert=True):
+            self.assertEqual(add_members(self.user, "favorite_songs", [self.songs[0].id]), set())
+
+        self.songs[0].refresh_from_db()
+        # Only the request that inserted the row counts it
+        self.assertEqual(self.songs[0].favorite_count, 0)
+        self.assertEqual(self.user.favorite_songs.count(), 1)
+
+    def test_racing_removes_are_reported_once(self):
+        self.user.favorite_songs.add(self.songs[0])
+
+        with self.race(insert=False):
+            self.assertEqual(remove_members(self.user, "favorite_songs", [self.songs[0].id]), 0)
+
+        self.songs[0].refresh_from_db()
+        self.assertEqual(self.songs[0].favorite_count, 1)
+
+
+class CounterTests(TestCase):
+    def setUp(self):
+        self.artist = Artist.objects.create(name="Artist")
+        self.songs = create_songs(3, artist=self.artist)
+        self.user = User.objects.create_user("fan", password="pass")
+
+    def test_job_saves_skip_the_artist_lookup_and_reindex(self):
+        song = self.songs[0]
+        song.status = Song.FAILED
+
+        with self.assertNumQueries(1):
+            song.save(update_fields=["status"])
+
+        self.artist.refresh_from_db()
+        self.assertEqual(self.artist.song_count, 3)
+
+    def assertCounts(self, favorites, album_songs, artist_songs, album):
+        self.songs[0].refresh_from_db()
+        album.refresh_from_db()
+        self.artist.refresh_from_db()
+        self.assertEqual(self.songs[0].favorite_count, favorites)
+        self.assertEqual(album.song_count, album_songs)
+        self.assertEqual(self.artist.song_count, artist_songs)
+
+    def test_counters_follow_changes(self):
+        album = Album.objects.create(name="Mix", user=self.user)
+        self.user.favorite_songs.add(self.songs[0])
+        album.songs.add(*self.songs)
+        self.assertCounts(1, 3, 3, album)
+
+        # Removing a song that is not a favorite must not decrement
+        self.user.favorite_songs.remove(self.songs[0], self.songs[1])
+        self.songs[0].album_set.clear()
+        self.songs[2].delete()
+        self.assertCounts(0, 1, 2, album)
+
+    def test_recount_repairs_drift(self):
+        self.user.favorite_songs.add(self.songs[0])
+        Artist.objects.update(song_count=42)
+        Song.objects.update(favorite_count=0)
+
+        call_command("recount", stdout=StringIO())
+
+        self.artist.refresh_from_db()
+        self.songs[0].refresh_from_db()
+        self.assertEqual(self.artist.song_count, 3)
+        self.assertEqual(self.songs[0].favorite_count, 1)
+
+
+@patch.object(trending, "DRAIN_GRACE", 0)
+class TrendingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        caches["throttling"].clear()
+
+    def test_plays_are_buffered_and_ranked(self):
+        quiet, hit = create_songs(2)
+
+        with self.assertNumQueries(0):
+            for _ in range(3):
+                self.client.post(reverse("api-song-play", args=[hit.id]))
+        self.client.post(reverse("api-song-play", args=[quiet.id]))
+
+        # Drained from the shared cache, as by `manage.py update_trending`
+        self.assertEqual(trending.buffer.drain(), 2)
+        trending.update_rankings()
+        response = self.client.get(reverse("api-song-trending"))
+
+        self.assertEqual([s["id"] for s in response.data["results"]], [hit.id, quiet.id])
+
+    def test_events_recorded_during_a_drain_wait_for_the_next_one(self):
+        song = create_songs(1)[0]
+        trending.buffer.record(song.id, plays=2)
+        self.assertEqual(trending.buffer.drain(), 1)
+        trending.buffer.record(song.id, plays=1, favorites=1)
+
+        self.assertEqual(trending.buffer.drain(), 1)
+        self.assertEqual(trending.buffer.drain(), 0)
+        self.assertEqual(
+            sorted(SongActivity.objects.values_list("plays", "favorites")), [(1, 1), (2, 0)]
+        )
+
+    def test_failed_insert_keeps_the_events(self):
+        song = create_songs(1)[0]
+        trending.buffer.record(song.id, plays=3)
+
+        with patch.object(SongActivity.objects, "bulk_create", side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                trending.buffer.drain()
+        trending.buffer.record(song.id, plays=1)
+
+        self.assertEqual(trending.buffer.drain(), 2)
+        self.assertEqual(SongActivity.objects.aggregate(plays=Sum("plays"))["plays"], 4)
+
+    def test_plays_are_throttled_per_client(self):
+        song = create_songs(1)[0]
+        url = reverse("api-song-play", args=[song.id])
+
+        with patch.object(api_views.PlayRateThrottle, "THROTTLE_RATES", {"play": "2/minute"}):
+            statuses = [self.client.post(url).status_code for _ in range(3)]
+
+        self.assertEqual(statuses, [202, 202, 429])
+
+
+class RecommendationTests(TestCase):
+    def setUp(self):
+        self.a, self.b, self.c, self.d = create_songs(4)
+        # b shares both fans of a, c only one of them
+        for name, songs in (("one", [self.a, self.b]), ("two", [self.a, self.b, self.c])):
+            User.objects.create_user(name, password="pass").favorite_songs.add(*songs)
+
+    def test_top_neighbors_are_cosine_ranked(self):
+        matrix, song_ids = recommendations.interaction_matrix()
+        column = list(song_ids).index(self.a.id)
+
+        [(song_id, neighbors)] = recommendations.top_neighbors(matrix, song_ids, [column])
+
+        self.assertEqual(song_id, self.a.id)
+        self.assertEqual([pk for pk, _ in neighbors], [self.b.id, self.c.id])
+        self.assertAlmostEqual(neighbors[0][1], 1.0, places=5)
+        self.assertAlmostEqual(neighbors[1][1], 2 ** -0.5, places=5)
+
+    def test_similar_and_recommended_songs(self):
+        self.assertEqual(recommendations.build_similarity(), 3)
+
+        response = self.client.get(reverse("api-song-similar", args=[self.a.id]))
+        self.assertEqual([s["id"] for s in response.data], [self.b.id, self.c.id])
+
+        fan = User.objects.create_user("fan", password="pass")
+        fan.favorite_songs.add(self.c)
+        recommendations.build_similarity(incremental=True)
+        client = APIClient()
+        client.force_authenticate(fan)
+        response = client.get(reverse("api-recommendations"))
+
+        # Both tie with c; the fan's own favorite is left out
+        self.assertCountEqual([s["id"] for s in response.data], [self.a.id, self.b.id])
+
+    def test_incremental_build_only_touches_stale_songs(self):
+        recommendations.build_similarity()
+        self.assertFalse(StaleSimilarity.objects.exists())
+        self.assertEqual(recommendations.build_similarity(incremental=True), 0)
+
+        User.objects.get(username="one").favorite_songs.add(self.d)
+
+        self.assertEqual(recommendations.build_similarity(incremental=True), 1)
+        self.assertTrue(SongNeighbor.objects.filter(song=self.d).exists())
+
+    def test_songs_marked_during_a_build_stay_stale(self):
+        top_neighbors = recommendations.top_neighbors
+
+        def mark_meanwhile(*args, **kwargs):
+            User.objects.get(username="one").favorite_songs.remove(self.a)
+            yield from top_neighbors(*args, **kwargs)
+
+        with patch.object(recommendations, "top_neighbors", mark_meanwhile):
+            recommendations.build_similarity()
+
+        self.assertEqual(list(StaleSimilarity.objects.values_list("song_id", flat=True)), [self.a.id])
+
+
+class AudioMetadataTests(TestCase):
+    def test_constant_bitrate(self):
+        data = BytesIO(b"ID3\x03\x00\x00\x00\x00\x00\x0a" + bytes(10) + MP3_FRAME * 100)
+        metadata = read_audio_metadata(data)
+
+        self.assertEqual(metadata["bitrate"], 128)
+        self.assertEqual(metadata["sample_rate"], 44100)
+        self.assertAlmostEqual(metadata["duration"], 2.606, places=2)
+        self.assertEqual(metadata["file_size"], 20 + 417 * 100)
+        self.assertEqual(data.tell(), 0)
+
+    def test_not_mp3(self):
+        with self.assertRaises(InvalidAudio):
+            read_audio_metadata(BytesIO(b"RIFF" + bytes(1000)))
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+def fake_ffmpeg(body):
+    """Executable standing in for ffmpeg, running the Python `body`."""
+    path = os.path.join(tempfile.mkdtemp(), "ffmpeg")
+    with open(path, "w") as f:
+        f.write(f"#!{sys.executable}\nimport sys, time\n{body}\n")
+    os.chmod(path, 0o755)
+
+    return path
+
+
+class DecodePcmTests(TestCase):
+    def test_verbose_errors_do_not_block_the_decode(self):
+        # Far more stderr than a pipe buffer holds, before any stdout
+        ffmpeg = fake_ffmpeg("sys.stderr.write('x' * 1_000_000); sys.stdout.buffer.write(bytes(10)); sys.exit(1)")
+
+        with override_settings(FFMPEG_BINARY=ffmpeg), self.assertRaisesMessage(RuntimeError, "ffmpeg failed: xxx"):
+            list(decode_pcm("in.mp3", 8000, timeout=30))
+
+    def test_stuck_decodes_are_killed(self):
+        ffmpeg = fake_ffmpeg("time.sleep(60)")
+
+        with override_settings(FFMPEG_BINARY=ffmpeg), self.assertRaisesMessage(RuntimeError, "timed out"):
+            list(decode_pcm("in.mp3", 8000, timeout=0.5))
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class UploadJobTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        admin = User.objects.create_user("admin", password="pw", is_staff=True)
+        self.client.force_authenticate(admin)
+
+    def upload(self, content):
+        return self.client.post(
+            reverse("api-admin-songs"),
+            {"title": "Upload", "audio_file": SimpleUploadedFile("upload.mp3", content)},
+            format="multipart",
+        )
+
+    def test_upload_is_accepted_then_processed(self):
+        response = self.upload(MP3_FRAME * 100)
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data["status"], Song.PENDING)
+        self.assertEqual(Job.objects.count(), 1)
+
+        # process_song, then the waveform, loudness and HLS jobs it queues
+        self.assertEqual(jobs.run_pending(), 4)
+        song = Song.objects.get(pk=response.data["id"])
+        self.assertEqual(song.status, Song.READY)
+        self.assertEqual(song.bitrate, 128)
+        self.assertFalse(Job.objects.exists())
+
+    def test_unprocessed_songs_stay_off_the_catalog(self):
+        song_id = self.upload(MP3_FRAME * 100).data["id"]
+        listed = lambda: [s["id"] for s in self.client.get(reverse("api-song-list")).data["results"]]
+
+        self.assertEqual(listed(), [])
+        self.assertEqual(self.client.get(reverse("api-search"), {"query": "upload"}).data["results"], [])
+        self.assertEqual(self.client.get(reverse("api-song-stream", args=[song_id])).status_code, 404)
+        self.assertEqual(self.client.get(reverse("api-song-playlist", args=[song_id])).status_code, 404)
+
+        jobs.run_pending()
+
+        self.assertEqual(listed(), [song_id])
+
+    def test_jobs_that_keep_killing_their_worker_fail(self):
+        song_id = self.upload(MP3_FRAME * 100).data["id"]
+        # Claimed for the last time, then the worker died
+        Job.objects.update(
+            status=Job.RUNNING, attempts=F("max_attempts"), updated_at=timezone.now() - timedelta(hours=1)
+        )
+
+        self.assertEqual(jobs.requeue_stale(), 0)
+
+        self.assertEqual(Job.objects.get().status, Job.FAILED)
+        self.assertEqual(Song.objects.get(pk=song_id).status, Song.FAILED)
+        self.assertEqual(jobs.run_pending(), 0)
+
+    @override_settings(JOBS_EAGER=True)
+    def test_eager_invalid_file_fails(self):
+        response = self.upload(b"RIFF" + bytes(1000))
+
+        self.assertEqual(Song.objects.get(pk=response.data["id"]).status, Song.FAILED)
+        self.assertFalse(Job.objects.exists())
+
+    def test_retry_with_backoff(self):
+        calls = []
+
+        @jobs.task(max_attempts=2)
+        def flaky_test_task():
+            calls.append(1)
+            raise RuntimeError("boom")
+
+        job = jobs.enqueue("flaky_test_task")
+        jobs.run_pending()
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertGreater(job.run_at, timezone.now())
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        jobs.run_pending()
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, len(calls)), (Job.FAILED, 2, 2))
+        self.assertIn("boom", job.last_error)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), JOBS_EAGER=True)
+class ImageVariantTests(TestCase):
+    def image_upload(self, size=(800, 600)):
+        from PIL import Image
+
+        out = BytesIO()
+        Image.new("RGB", size, "red").save(out, "PNG")
+        return SimpleUploadedFile("cover.png", out.getvalue())
+
+    def test_variants_are_built_once(self):
+        artist = Artist.objects.create(name="Painter", image=self.image_upload())
+        artist.refresh_from_db()
+
+        variants = artist.image_variants
+        self.assertEqual(variants["source"], artist.image.name)
+        self.assertEqual(variants["widths"], {"thumb": 160, "medium": 480, "large": 800})
+        srcset = ArtistSerializer(artist).data["image_srcset"]
+        self.assertIn("160w", srcset["image/jpeg"])
+        self.assertIn("image/webp", srcset)
+
+        # Re-saving doesn't queue the work again
+        with patch("app.signals.enqueue") as enqueue:
+            artist.save()
+        enqueue.assert_not_called()
+
+    def test_picture_without_an_upload_shows_the_placeholder(self):
+        song = create_songs(1)[0]
+        html = Template("{% load responsive %}{% picture song.cover_image song.cover_variants '60px' %}").render(
+            Context({"song": song})
+        )
+
+        self.assertIn('src="/static/images/logo-IT.png"', html)
+        self.assertNotIn("<source", html)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class WaveformTests(TestCase):
+    def test_peaks_are_min_max_per_block(self):
+        import numpy as np
+
+        pcm = np.array([0, 256, -512, 1024, 32767, -32768, 5], dtype="<i2").tobytes()
+        # Split mid-block to check the carry between chunks
+        peaks = waveform.compute_peaks([pcm[:6], pcm[6:]], samples_per_pixel=3)
+
+        self.assertEqual(peaks.tolist(), [-2, 1, -128, 127, 0, 0])
+
+    def test_endpoint_serves_peaks_with_long_cache(self):
+        song = create_songs(1)[0]
+        song.waveform.save("song-0.dat", ContentFile(waveform.encode(waveform.compute_peaks([]))))
+
+        response = self.client.get(reverse("api-song-waveform", args=[song.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("max-age=31536000", response["Cache-Control"])
+
+        repeat = self.client.get(
+            reverse("api-song-waveform", args=[song.id]), HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+        self.assertEqual(repeat.status_code, 304)
+
+
+class LoudnessTests(TestCase):
+    def pcm(self, amplitude, seconds=3):
+        import numpy as np
+
+        t = np.arange(loudness.SAMPLE_RATE * seconds) / loudness.SAMPLE_RATE
+        tone = amplitude * np.sin(2 * np.pi * 1000 * t)
+        samples = (np.repeat(tone[:, None], 2, axis=1) * 32767).astype("<i2").tobytes()
+        # Odd-sized chunks exercise the filter state / step carry-over
+        return [samples[i : i + 40004] for i in range(0, len(samples), 40004)]
+
+    def test_sine_reference(self):
+        # 1 kHz stereo sine at -20 dBFS reads -20 LUFS (K-weighting ~0 dB there)
+        value, peak = loudness.measure(self.pcm(0.1))
+
+        self.assertAlmostEqual(value, -20.0, delta=0.1)
+        self.assertAlmostEqual(peak, 0.1, places=3)
+
+    def test_silence_has_no_loudness(self):
+        self.assertEqual(loudness.measure(self.pcm(0)), (None, 0))
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class PlaylistTests(TestCase):
+    def test_falls_back_to_progressive_mp3(self):
+        song = create_songs(1)[0]
+
+        response = self.client.get(reverse("api-song-playlist", args=[song.id]))
+
+        self.assertRedirects(
+            response, reverse("api-song-stream", args=[song.id]), fetch_redirect_response=False
+        )
+
+    def test_master_playlist_points_at_media(self):
+        song = create_songs(1)[0]
+        song.hls_playlist = "hls/1/abc/master.m3u8"
+        song.save()
+        storage = song.audio_file.storage
+        storage.save(song.hls_playlist, ContentFile(hls.master_playlist([64, 128]).encode()))
+
+        response = self.client.get(reverse("api-song-playlist", args=[song.id]))
+
+        self.assertEqual(response["Content-Type"], "application/vnd.apple.mpegurl")
+        self.assertIn("http://testserver/media/hls/1/abc/128k/index.m3u8", response.content.decode())
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class SongStreamTests(TestCase):
+    def setUp(self):
+        self.song = Song.objects.create(title="Song", audio_file="songs/placeholder.mp3", status=Song.READY)
+        self.song.audio_file.save("song.mp3", ContentFile(bytes(range(100))))
+        self.url = reverse("api-song-stream", args=[self.song.id])
+
+    def body(self, response):
+        return b"".join(response.streaming_content)
+
+    def test_whole_file_and_ranges(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertEqual(self.body(response), bytes(range(100)))
+
+        response = self.client.get(self.url, HTTP_RANGE="bytes=10-19")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], "bytes 10-19/100")
+        self.assertEqual(self.body(response), bytes(range(10, 20)))
+
+        # Open-ended and suffix ranges
+        self.assertEqual(self.body(self.client.get(self.url, HTTP_RANGE="bytes=95-")), bytes(range(95, 100)))
+        response = self.client.get(self.url, HTTP_RANGE="bytes=-5")
+        self.assertEqual(response["Content-Range"], "bytes 95-99/100")
+        self.assertEqual(self.body(response), bytes(range(95, 100)))
+
+    def test_unsatisfiable_range_is_416(self):
+        response = self.client.get(self.url, HTTP_RANGE="bytes=100-")
+
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], "bytes */100")
+
+    def test_if_range_mismatch_sends_the_whole_file(self):
+        etag = self.client.get(self.url)["ETag"]
+
+        matching = self.client.get(self.url, HTTP_RANGE="bytes=0-9", HTTP_IF_RANGE=etag)
+        stale = self.client.get(self.url, HTTP_RANGE="bytes=0-9", HTTP_IF_RANGE='"stale"')
+
+        self.assertEqual(matching.status_code, 206)
+        self.assertEqual(stale.status_code, 200)
+        self.assertEqual(len(self.body(stale)), 100)
+
+    def test_missing_file_is_404(self):
+        self.song.audio_file.storage.delete(self.song.audio_file.name)
+
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+@patch("app.conditional.is_shared", lambda using="default": True)
+class AsyncApiTests(TestCase):
+    def setUp(self):
+        self.artist = Artist.objects.create(name="Band")
+        self.genre = Genre.objects.create(name="Rock")
+        create_songs(25, artist=self.artist, genres=[self.genre])
+        cache.clear()
+        local_cache.clear()
+
+    def test_song_list_matches_sync_view(self):
+        sync = self.client.get(reverse("api-song-list"), {"cursor": ""}).json()
+        response = self.client.get(reverse("api-async-song-list"))
+
+        self.assertEqual(response.json()["results"], sync["results"])
+        self.assertEqual(response.json()["next"].split("cursor=")[1], sync["next"].split("cursor=")[1])
+
+        repeat = self.client.get(reverse("api-async-song-list"), HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(repeat.status_code, 304)
+
+    def test_detail_and_lists(self):
+        song = Song.objects.first()
+
+        self.assertEqual(
+            self.client.get(reverse("api-async-song-detail", args=[song.id])).json(),
+            self.client.get(reverse("api-song-detail", args=[song.id])).json(),
+        )
+        self.assertEqual(self.client.get(reverse("api-async-genre-list")).json()["count"], 1)
+        self.assertEqual(
+            self.client.get(reverse("api-async-artist-detail", args=[self.artist.id])).json()["name"],
+            "Band",
+        )
+        self.assertEqual(self.client.get(reverse("api-async-song-detail", args=[0])).status_code, 404)
+
+    def test_song_detail_follows_artist_changes(self):
+        url = reverse("api-async-song-detail", args=[Song.objects.first().id])
+        response = self.client.get(url)
+        self.assertNotIn("Last-Modified", response)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+
+        self.artist.name = "Renamed"
+        self.artist.save()
+        renamed = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+
+        self.assertEqual(renamed.status_code, 200)
+        self.assertEqual(renamed.json()["artist"]["name"], "Renamed")
+
+    @override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+    async def test_stream_serves_ranges(self):
+        song = await Song.objects.afirst()
+        await sync_to_async(song.audio_file.save)("song.mp3", ContentFile(MP3_FRAME * 10))
+
+        response = await self.async_client.get(
+            reverse("api-async-song-stream", args=[song.id]), headers={"Range": "bytes=0-3"}
+        )
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b"".join([chunk async for chunk in response.streaming_content]), MP3_FRAME[:4])
+
+    def test_search_requires_a_token(self):
+        self.assertEqual(self.client.get(reverse("api-async-search")).status_code, 401)
+
+        user = User.objects.create_user("listener", password="pw")
+        token = RefreshToken.for_user(user).access_token
+        response = self.client.get(
+            reverse("api-async-search"), {"query": "song"}, HTTP_AUTHORIZATION=f"Bearer {token}"
+        )
+
+        self.assertEqual(response.json()["count"], 25)
+
+
+class JWTAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        validated_tokens.clear()
+        for patcher in (
+            patch.object(authentication, "blacklist_filter", BlacklistFilter()),
+            # One test process: LocMem is as shared as Redis would be
+            patch.object(authentication, "is_shared", return_value=True),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user(username="listener", password="pass-12345")
+        self.client = APIClient()
+
+    def test_user_lookups_are_cached_until_the_user_is_saved(self):
+        authenticator = CachedJWTAuthentication()
+        raw = str(RefreshToken.for_user(self.user).access_token).encode()
+
+        with self.assertNumQueries(1):
+            user = authenticator.get_user(authenticator.get_validated_token(raw))
+        with self.assertNumQueries(0):
+            self.assertEqual(authenticator.get_user(authenticator.get_validated_token(raw)), user)
+
+        self.user.is_active = False
+        self.user.save()
+
+        with self.assertRaises(AuthenticationFailed):
+            authenticator.get_user(authenticator.get_validated_token(raw))
+
+    def test_cached_user_has_no_password_and_saves_safely(self):
+        authenticator = CachedJWTAuthentication()
+        raw = str(RefreshToken.for_user(self.user).access_token).encode()
+        authenticator.get_user(authenticator.get_validated_token(raw))
+
+        entry = caches["querysets"].get(authentication.user_cache_key(self.user.pk))
+        self.assertNotIn(self.user.password, repr(entry))
+        user = authenticator.get_user(authenticator.get_validated_token(raw))
+        user.first_name = "Listener"
+        user.save()
+
+        self.assertTrue(User.objects.get(pk=self.user.pk).check_password("pass-12345"))
+
+    def test_process_local_cache_reads_the_user_every_time(self):
+        authenticator = CachedJWTAuthentication()
+        raw = str(RefreshToken.for_user(self.user).access_token).encode()
+
+        with patch.object(authentication, "is_shared", return_value=False):
+            with self.assertNumQueries(1):
+                authenticator.get_user(authenticator.get_validated_token(raw))
+            # Deactivated by another worker, which can't reach this one's LocMem
+            User.objects.filter(pk=self.user.pk).update(is_active=False)
+            with self.assertRaises(AuthenticationFailed):
+                authenticator.get_user(authenticator.get_validated_token(raw))
+
+    def test_blacklisted_refresh_token_is_rejected(self):
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+
+        self.assertEqual(self.client.post(reverse("token_refresh"), {"refresh": str(refresh)}).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("api-logout"), {"refresh": str(refresh)})
+        response = self.client.post(reverse("token_refresh"), {"refresh": str(refresh)})
+
+        self.assertEqual(response.status_code, 401)
+
+    def test_unlisted_refresh_token_skips_the_blacklist_table(self):
+        refresh = RefreshToken.for_user(self.user)
+        self.client.post(reverse("token_refresh"), {"refresh": str(refresh)})
+
+        with CaptureQueriesContext(connections["default"]) as queries:
+            response = self.client.post(reverse("token_refresh"), {"refresh": str(refresh)})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any("blacklistedtoken" in q["sql"] for q in queries))
+
+    def test_process_local_cache_always_checks_the_blacklist_table(self):
+        refresh = RefreshToken.for_user(self.user)
+        self.client.post(reverse("token_refresh"), {"refresh": str(refresh)})
+
+        with patch.object(authentication, "is_shared", return_value=False):
+            with CaptureQueriesContext(connections["default"]) as queries:
+                response = self.client.post(reverse("token_refresh"), {"refresh": str(refresh)})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(any("blacklistedtoken" in q["sql"] for q in queries))
+
+    def test_rows_committed_out_of_pk_order_are_loaded(self):
+        first, late = RefreshToken.for_user(self.user), RefreshToken.for_user(self.user)
+        first.blacklist()
+        BlacklistedToken.objects.update(id=10)
+        authentication.blacklist_filter.refresh()
+
+        # A lower pk, committed after the filter has loaded pk 10
+        late.blacklist()
+        BlacklistedToken.objects.filter(token__jti=late["jti"]).update(id=5)
+        bump_version("blacklist")
+
+        self.assertTrue(authentication.blacklist_filter.might_contain(late["jti"]))
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        bloom = BloomFilter(1000, error_rate=0.01)
+        for i in range(1000):
+            bloom.add(f"jti-{i}")
+
+        self.assertTrue(all(f"jti-{i}" in bloom for i in range(1000)))
+        false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+        self.assertLess(false_positives, 300)
+        self.assertTrue(bloom.full)
+
+    def test_prune_tokens_deletes_expired_rows_in_batches(self):
+        expired = RefreshToken.for_user(self.user)
+        expired.blacklist()
+        RefreshToken.for_user(self.user).blacklist()
+        OutstandingToken.objects.filter(jti=expired["jti"]).update(
+            expires_at=timezone.now() - timedelta(days=1)
+        )
+        out = StringIO()
+
+        call_command("prune_tokens", "--batch-size", "1", stdout=out)
+
+        self.assertEqual(OutstandingToken.objects.count(), 1)
+        self.assertEqual(BlacklistedToken.objects.count(), 1)
+        self.assertIn("BlacklistedToken: 1 row(s) deleted", out.getvalue())
+
+
+class ReplicaRouterTests(TestCase):
+    def test_only_catalog_reads_use_the_replica(self):
+        router = ReplicaRouter()
+
+        with patch.dict(settings.DATABASES, {"replica": {}}):
+            self.assertIsNone(router.db_for_read(Song))
+            with replica_reads():
+                self.assertEqual(router.db_for_read(Song), "replica")
+                self.assertIsNone(router.db_for_write(Song))
+
+        # No replica configured: stay on default
+        without_replica = {alias: db for alias, db in settings.DATABASES.items() if alias != "replica"}
+        with patch.dict(settings.DATABASES, without_replica, clear=True), replica_reads():
+            self.assertIsNone(router.db_for_read(Song))
+
+    def test_replica_is_never_migrated(self):
+        self.assertFalse(ReplicaRouter().allow_migrate("replica", "app"))
+        self.assertIsNone(ReplicaRouter().allow_migrate("default", "app"))
+
+
+@skipUnless("replica" in settings.DATABASES, "set DB_REPLICA_NAME (SQLite) or DB_REPLICA_HOST")
+class ReplicaRoutingTests(TransactionTestCase):
+    # e.g. DB_ENGINE=django.db.backends.sqlite3 DB_NAME=db.sqlite3 DB_REPLICA_NAME=replica.sqlite3
+    databases = {"default", *({"replica"} & set(settings.DATABASES))}
+
+    def test_song_list_reads_from_the_replica(self):
+        create_songs(3)
+
+        with CaptureQueriesContext(connections["default"]) as default, CaptureQueriesContext(
+            connections["replica"]
+        ) as replica:
+            response = self.client.get(reverse("api-song-list"))
+
+        self.assertEqual(len(response.json()["results"]), 3)
+        self.assertTrue(replica.captured_queries)
+        self.assertFalse(default.captured_queries)
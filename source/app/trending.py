@@ -0,0 +1,170 @@
+import math
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import Song, SongActivity, SongRanking
+
+
+# Buffered counters outlive a missed `update_trending` run or two
+BUFFER_TTL = 2 * 24 * 3600
+# Time given to writers that read the epoch just before a drain bumped it
+DRAIN_GRACE = 1
+DRAIN_LOCK_TIMEOUT = 300
+
+WINDOW = timedelta(days=7)
+# "Trending now" halves an event's weight every HALF_LIFE_HOURS
+HALF_LIFE_HOURS = 24
+FAVORITE_WEIGHT = 5
+CHART_SIZE = 500
+
+
+def current_bucket():
+    return timezone.now().replace(minute=0, second=0, microsecond=0)
+
+
+class ActivityBuffer:
+    """
+    Play/favorite events counted in the shared default cache and drained
+    into SongActivity by `manage.py update_trending`.
+
+    Events are summed per (song, hour) with cache incr, so a play costs no
+    query and every worker counts into the same keys. Counters are grouped
+    by epoch: a drain starts a new epoch, writes the closed ones as one bulk
+    INSERT and only then moves past them, so a failed insert is retried by
+    the next run instead of losing the events.
+    """
+
+    def __init__(self, alias="default", prefix="trending"):
+        self.alias = alias
+        self.prefix = prefix
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def key(self, *parts):
+        return ":".join([self.prefix, *map(str, parts)])
+
+    def counter_key(self, epoch, song_id, bucket, kind):
+        return self.key(epoch, song_id, f"{bucket:%Y%m%d%H}", kind)
+
+    def record(self, song_id, plays=0, favorites=0):
+        cache = self.cache
+        bucket = current_bucket()
+        epoch = cache.get(self.key("epoch"), 0)
+
+        # First event for (song, hour) in this epoch: list it for the drain
+        if cache.add(self.counter_key(epoch, song_id, bucket, "seen"), 1, BUFFER_TTL):
+            cache.add(self.key(epoch, "slots"), 0, BUFFER_TTL)
+            slot = cache.incr(self.key(epoch, "slots"))
+            cache.set(self.key(epoch, "slot", slot), (song_id, bucket), BUFFER_TTL)
+
+        for kind, value in (("plays", plays), ("favorites", favorites)):
+            if not value:
+                continue
+            key = self.counter_key(epoch, song_id, bucket, kind)
+            if not cache.add(key, value, BUFFER_TTL):
+                try:
+                    cache.incr(key, value)
+                except ValueError:
+                    # Drained and deleted in between; the event is dropped
+                    pass
+
+    def drain(self):
+        """Write every closed epoch to SongActivity; return the rows written."""
+        cache = self.cache
+        lock = self.key("draining")
+        if not cache.add(lock, 1, DRAIN_LOCK_TIMEOUT):
+            return 0
+
+        try:
+            cache.add(self.key("epoch"), 0, None)
+            current = cache.incr(self.key("epoch"))
+            time.sleep(DRAIN_GRACE)
+
+            written = 0
+            first = min(cache.get(self.key("drained"), 0), current - 1)
+            for epoch in range(first, current):
+                written += self.drain_epoch(epoch)
+            return written
+        finally:
+            cache.delete(lock)
+
+    def drain_epoch(self, epoch):
+        cache = self.cache
+        slot_keys = [self.key(epoch, "slot", n) for n in range(1, cache.get(self.key(epoch, "slots"), 0) + 1)]
+        pairs = list(cache.get_many(slot_keys).values())
+        counter_keys = {
+            (song_id, bucket, kind): self.counter_key(epoch, song_id, bucket, kind)
+            for song_id, bucket in pairs
+            for kind in ("plays", "favorites", "seen")
+        }
+        counts = cache.get_many(counter_keys.values())
+
+        rows = {}
+        for (song_id, bucket, kind), key in counter_keys.items():
+            if kind != "seen":
+                rows.setdefault((song_id, bucket), {"plays": 0, "favorites": 0})[kind] = counts.get(key, 0)
+
+        # Drop events for songs deleted meanwhile (or bogus ids)
+        valid = set(
+            Song.objects.filter(id__in={song_id for song_id, _ in rows}).values_list("id", flat=True)
+        )
+        activity = [
+            SongActivity(song_id=song_id, bucket=bucket, **values)
+            for (song_id, bucket), values in rows.items()
+            if song_id in valid and any(values.values())
+        ]
+        with transaction.atomic():
+            SongActivity.objects.bulk_create(activity, batch_size=1000)
+        cache.set(self.key("drained"), epoch + 1, None)
+
+        # Only cleanup from here on: the counters also expire on their own
+        cache.delete_many([*slot_keys, *counter_keys.values(), self.key(epoch, "slots")])
+
+        return len(activity)
+
+
+buffer = ActivityBuffer()
+
+
+def compute_scores(now=None):
+    """Return {chart: {song_id: score}} from the last WINDOW of activity."""
+    now = now or timezone.now()
+    decay = math.log(2) / HALF_LIFE_HOURS
+    scores = {SongRanking.TRENDING: Counter(), SongRanking.WEEK: Counter()}
+
+    rows = (
+        SongActivity.objects.filter(bucket__gte=now - WINDOW)
+        .values("song_id", "bucket")
+        .annotate(plays=Sum("plays"), favorites=Sum("favorites"))
+        .order_by()
+    )
+    for row in rows.iterator():
+        weight = row["plays"] + FAVORITE_WEIGHT * row["favorites"]
+        age_hours = max((now - row["bucket"]).total_seconds() / 3600, 0)
+        scores[SongRanking.TRENDING][row["song_id"]] += weight * math.exp(-decay * age_hours)
+        scores[SongRanking.WEEK][row["song_id"]] += weight
+
+    return scores
+
+
+def update_rankings(now=None):
+    """Rewrite the precomputed charts and drop activity outside the window."""
+    now = now or timezone.now()
+
+    with transaction.atomic():
+        for chart, scores in compute_scores(now).items():
+            SongRanking.objects.filter(chart=chart).delete()
+            SongRanking.objects.bulk_create(
+                SongRanking(chart=chart, position=position, song_id=song_id, score=score)
+                for position, (song_id, score) in enumerate(scores.most_common(CHART_SIZE), 1)
+            )
+
+        SongActivity.objects.filter(bucket__lt=now - WINDOW).delete()
@@ -3,17 +3,54 @@ from django.shortcuts import render, redirect
 from django.contrib.auth import authenticate, login as auth_login, logout as auth_logout
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.core.paginator import Paginator
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404
 
 from .forms import RegisterForm, AlbumForm
 from .models import Song, Album, Genre, Artist
+from .search import search_songs
+from .caching import cached_versioned, get_version
+from .membership import add_members, remove_members, toggle_member
+from .routers import reads_from_replica
+
+
+def catalog_cache_context(request):
+    """
+    Generation keys for the `{% cache %}` fragments of the catalog pages.
+
+    Song cards show the Like/Liked state, so song fragments also vary on
+    the user and their favorites generation; artist fragments are shared.
+    """
+    context = {
+        "cache_timeout": settings.CATALOG_CACHE_TIMEOUT,
+        "songs_version": get_version("songs"),
+        "artists_version": get_version("artists"),
+    }
+    if request.user.is_authenticated:
+        context["favorites_version"] = get_version(f"favorites:{request.user.id}")
+
+    return context
 
 
 def index(request):
-    songs = Song.objects.all().order_by("-id")[:5]  # Display newest
-    artists = Artist.objects.all()
+    # Querysets are only evaluated when their cached fragment misses
+    songs = Song.objects.ready().select_related("artist").order_by("-id")[:5]  # Display newest
+    artists = Artist.objects.all().order_by("-id")[:5]  # Display newest, like artists()
+    has_catalog = cached_versioned(
+        "catalog", lambda: Song.objects.ready().exists() and Artist.objects.exists()
+    )
 
-    return render(request, "index.html", {"songs": songs, "artists": artists})
+    return render(
+        request,
+        "index.html",
+        {
+            "songs": songs,
+            "artists": artists,
+            "has_catalog": has_catalog,
+            **catalog_cache_context(request),
+        },
+    )
 
 
 # User
@@ -78,10 +115,13 @@ def favorite_songs(request):
 
 # Songs
 def songs(request):
-    songs = Song.objects.all().order_by("-id")[:5]  # Display newest Songs
-    artists = Artist.objects.all()
+    songs = Song.objects.ready().select_related("artist").order_by("-id")[:5]  # Display newest Songs
 
-    return render(request, "app/song/index.html", {"songs": songs, "artists": artists})
+    return render(
+        request,
+        "app/song/index.html",
+        {"songs": songs, **catalog_cache_context(request)},
+    )
 
 
 @login_required
@@ -103,14 +143,9 @@ def song_detail(request, song_id):
 @login_required
 def song_to_favorite(request, song_id):
     song = get_object_or_404(Song, id=song_id)
-    user = request.user
 
-    if song in user.favorite_songs.all():
-        user.favorite_songs.remove(song)
-        is_favorite = False  # JavaScript
-    else:
-        user.favorite_songs.add(song)
-        is_favorite = True  # JavaScript
+    # Single DELETE or INSERT, no load of the user's favorites
+    is_favorite = toggle_member(request.user, "favorite_songs", song.id)  # JavaScript
 
     # Return JSON if request is AJAX (JavaScript)
     if request.headers.get("X-Requested-With") == "XMLHttpRequest":
@@ -126,10 +161,9 @@ def song_to_album(request, song_id):
         album_id = request.POST.get("album_id")
         album = get_object_or_404(Album, id=album_id, user=request.user)
 
-        if song in album.songs.all():
+        if not add_members(album, "songs", [song.id]):
             messages.info(request, "🎵 This Song is already in the Album.")
         else:
-            album.songs.add(song)
             messages.success(
                 request, f'Song "{song.title}" was added to Album "{album.name}".'
             )
@@ -140,7 +174,7 @@ def song_to_album(request, song_id):
 # Album
 @login_required()
 def albums(request):
-    albums = Album.objects.filter(user=request.user)
+    albums = Album.objects.filter(user=request.user).order_by("-created_at")
 
     return render(request, "app/album/index.html", {"albums": albums})
 
@@ -185,7 +219,7 @@ def album_remove_song(request, album_id, song_id):
     album = get_object_or_404(Album, id=album_id, user=request.user)
     song = get_object_or_404(Song, id=song_id)
 
-    album.songs.remove(song)
+    remove_members(album, "songs", [song.id])
     messages.success(request, f"Removed '{song.title}' from album.")
 
     return redirect("album_detail", album_id=album.id)
@@ -195,25 +229,32 @@ def album_remove_song(request, album_id, song_id):
 def artists(request):
     artists = Artist.objects.all().order_by("-id")[:5]
 
-    return render(request, "app/artist/index.html", {"artists": artists})
+    return render(
+        request,
+        "app/artist/index.html",
+        {"artists": artists, **catalog_cache_context(request)},
+    )
 
 
+@reads_from_replica
 def artist_detail(request, artist_id):
     artist = get_object_or_404(Artist, id=artist_id)
-    songs = Song.objects.filter(artist=artist).order_by("-id")
+    songs = Song.objects.ready().filter(artist=artist).select_related("artist").order_by("-id")
 
-    return render(request, "app/artist/detail.html", {"artist": artist, "songs": songs})
+    return render(
+        request,
+        "app/artist/detail.html",
+        {"artist": artist, "songs": songs, **catalog_cache_context(request)},
+    )
 
 
 # Search
+@reads_from_replica
 def search(request):
     query = request.GET.get("query", "")
     genre_id = request.GET.get("genre", "")
 
-    songs = Song.objects.all()
-
-    if query:
-        songs = songs.filter(title__icontains=query)
+    songs = Song.objects.ready().select_related("artist")
 
     selected_genre_obj = None
     if genre_id:
@@ -224,12 +265,18 @@ def search(request):
         except Genre.DoesNotExist:
             selected_genre_obj = None
 
-    artists = Artist.objects.all()
+    if query:
+        # Ranked full-text search over title, artist, genres and lyrics
+        songs = search_songs(query, songs)
+    else:
+        songs = songs.order_by("-id")
+
+    page = Paginator(songs, 20).get_page(request.GET.get("page"))
 
     context = {
         # Data
-        "songs": songs,
-        "artists": artists,
+        "songs": page,
+        "page_obj": page,
         # User input
         "query": query,
         "selected_genre": str(genre_id),
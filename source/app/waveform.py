@@ -0,0 +1,76 @@
+"""
+Seek-bar waveform peaks.
+
+Each song is decoded once, in the background: ffmpeg streams mono 16-bit PCM
+which NumPy reduces block by block to the (min, max) of every
+SAMPLES_PER_PIXEL samples, so memory stays flat whatever the track length.
+The peaks are written next to the audio in the audiowaveform ".dat" layout
+that waveform-data.js reads directly: a 20-byte header, then interleaved
+int8 min/max pairs (about 2 KB per minute).
+"""
+
+import os
+import struct
+
+from django.core.files.base import ContentFile
+
+from .audio import decode_pcm
+
+
+# Decode rate; plenty for a seek bar and 5x less work than 44.1 kHz
+SAMPLE_RATE = 8000
+# 10 peaks per second of audio
+SAMPLES_PER_PIXEL = 800
+# PCM read per step, a whole number of pixels
+READ_SIZE = SAMPLES_PER_PIXEL * 2 * 512
+
+# version, flags (1 = 8-bit), sample rate, samples per pixel, pixel count
+HEADER = struct.Struct("<iIiiI")
+VERSION = 1
+FLAG_8BIT = 1
+
+
+def compute_peaks(chunks, samples_per_pixel=SAMPLES_PER_PIXEL):
+    """Interleaved int8 [min, max, min, max, ...] array from int16 PCM chunks."""
+    import numpy as np
+
+    mins, maxs = [], []
+    rest = np.empty(0, dtype=np.int16)
+    for chunk in chunks:
+        samples = np.concatenate([rest, np.frombuffer(chunk, dtype="<i2")])
+        whole = len(samples) - len(samples) % samples_per_pixel
+        blocks = samples[:whole].reshape(-1, samples_per_pixel)
+        mins.append(blocks.min(axis=1))
+        maxs.append(blocks.max(axis=1))
+        rest = samples[whole:]
+
+    if len(rest):
+        mins.append(rest.min(keepdims=True))
+        maxs.append(rest.max(keepdims=True))
+
+    mins = np.concatenate(mins) if mins else np.empty(0, dtype=np.int16)
+    maxs = np.concatenate(maxs) if maxs else np.empty(0, dtype=np.int16)
+
+    peaks = np.empty(len(mins) * 2, dtype=np.int8)
+    # int16 -> int8 keeps the top byte
+    peaks[0::2] = mins >> 8
+    peaks[1::2] = maxs >> 8
+
+    return peaks
+
+
+def encode(peaks):
+    header = HEADER.pack(VERSION, FLAG_8BIT, SAMPLE_RATE, SAMPLES_PER_PIXEL, len(peaks) // 2)
+
+    return header + peaks.tobytes()
+
+
+def build_waveform(song):
+    """Decode `song.audio_file` and store its peaks in `song.waveform` (not saved)."""
+    pcm = decode_pcm(song.audio_file.path, SAMPLE_RATE, channels=1, read_size=READ_SIZE)
+    data = encode(compute_peaks(pcm))
+
+    if song.waveform:
+        song.waveform.delete(save=False)
+    name = os.path.splitext(os.path.basename(song.audio_file.name))[0] + ".dat"
+    song.waveform.save(name, ContentFile(data), save=False)
@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -83,18 +86,144 @@ WSGI_APPLICATION = "project.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+
+def env_bool(value):
+    return value if isinstance(value, bool) else str(value).lower() in ("1", "true", "yes", "on")
+
+
+def database_from_env(prefix, fallback):
+    """
+    One DATABASES entry from `<prefix>_*` environment variables, e.g.
+    DB_ENGINE, DB_NAME, DB_HOST, DB_CONN_MAX_AGE, DB_POOL.
+    """
+
+    def get(key, default=""):
+        return os.environ.get(f"{prefix}_{key}", fallback.get(key, default))
+
+    config = {
+        "ENGINE": get("ENGINE"),
+        "NAME": get("NAME"),
+        "USER": get("USER"),
+        "PASSWORD": get("PASSWORD"),
+        "HOST": get("HOST"),
+        "PORT": get("PORT"),
+        # Persistent connections (seconds, 0 = per request), pinged before reuse;
+        # WSGI only: under ASGI every request runs in its own thread, so keep 0
+        # (or use DB_POOL) there
+        "CONN_MAX_AGE": int(get("CONN_MAX_AGE", 0)),
+        "CONN_HEALTH_CHECKS": env_bool(get("CONN_HEALTH_CHECKS", True)),
+        "OPTIONS": {},
+    }
+    pooled = "pool" in fallback.get("OPTIONS", {}) or "POOL_OPTIONS" in fallback
+    if env_bool(get("POOL", pooled)):
+        min_size = int(get("POOL_MIN_SIZE", 2))
+        max_size = int(get("POOL_MAX_SIZE", 10))
+        if config["ENGINE"] == "django.db.backends.postgresql":
+            # Django's connection pool (psycopg 3)
+            config["OPTIONS"]["pool"] = {"min_size": min_size, "max_size": max_size}
+        elif config["ENGINE"].startswith("dj_db_conn_pool."):
+            # Pooled backend for the other engines, e.g. dj_db_conn_pool.backends.mysql
+            config["POOL_OPTIONS"] = {"POOL_SIZE": min_size, "MAX_OVERFLOW": max_size - min_size}
+        else:
+            raise ImproperlyConfigured(
+                f"{prefix}_POOL needs {prefix}_ENGINE=django.db.backends.postgresql or a "
+                f"dj_db_conn_pool backend, not {config['ENGINE']!r}"
+            )
+        # The pool replaces persistent connections
+        config["CONN_MAX_AGE"] = 0
+
+    return config
+
+
 DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.mysql",
-        "NAME": "MUSIC4U",
-        "USER": "root",
-        "PASSWORD": "admin",
-        "HOST": "localhost",
-        "PORT": "3306",
+    "default": database_from_env(
+        "DB",
+        {
+            "ENGINE": "django.db.backends.mysql",
+            "NAME": "MUSIC4U",
+            "USER": "root",
+            "PASSWORD": "admin",
+            "HOST": "localhost",
+            "PORT": "3306",
+        },
+    ),
+}
+
+# Read replica for the public catalog reads (app/routers.py), enabled by
+# DB_REPLICA_HOST (or DB_REPLICA_NAME for SQLite); unset keys fall back to DB_*
+if os.environ.get("DB_REPLICA_HOST") or os.environ.get("DB_REPLICA_NAME"):
+    DATABASES["replica"] = database_from_env("DB_REPLICA", DATABASES["default"])
+    DATABASES["replica"]["TEST"] = {"MIRROR": "default"}
+
+DATABASE_ROUTERS = ["app.routers.ReplicaRouter"]
+
+
+# Caches
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+# Bump on deploy (e.g. to the build number) so workers of the new release
+# never read values pickled by the old one; sessions are not versioned
+CACHE_VERSION = int(os.environ.get("CACHE_VERSION", 1))
+
+
+def cache_url(alias):
+    return os.environ.get(f"CACHE_{alias.upper()}_URL", os.environ.get("CACHE_URL"))
+
+
+def cache_from_env(alias, versioned=True):
+    """
+    One CACHES entry shared by all workers: Redis at CACHE_<ALIAS>_URL or
+    CACHE_URL (e.g. redis://localhost:6379/0). Without either, every alias
+    uses the same process-local LocMem store, as in development and tests.
+    """
+    url = cache_url(alias)
+    config = {
+        "KEY_PREFIX": f"m4u:{alias}",
+        "VERSION": CACHE_VERSION if versioned else 1,
     }
+    if url:
+        config["BACKEND"] = "django.core.cache.backends.redis.RedisCache"
+        config["LOCATION"] = url
+    else:
+        config["BACKEND"] = "django.core.cache.backends.locmem.LocMemCache"
+        config["LOCATION"] = "m4u"
+        config["OPTIONS"] = {"MAX_ENTRIES": 10000}
+
+    return config
+
+
+CACHES = {
+    # Generation counters (app/caching.py) and the search suggest index
+    "default": cache_from_env("default"),
+    # {% cache %} fragments of the catalog pages
+    "pages": cache_from_env("pages"),
+    # Query results behind app.caching.get_or_set / cached_versioned
+    "querysets": cache_from_env("querysets"),
+    "sessions": cache_from_env("sessions", versioned=False),
+    # Rate limit counters shared by all workers
+    "throttling": cache_from_env("throttling", versioned=False),
 }
 
 
+# Sessions: "cached_db" reads the logged-in user's session from the
+# sessions cache (falling back to the database), "signed_cookies" keeps it
+# client-side with no store at all (sessions can't be revoked server-side),
+# "db" is Django's default. Anonymous pages never load a session: the store
+# is only read when the request carries a session cookie.
+# cached_db needs the sessions cache shared by all workers, otherwise a
+# logout only evicts the session from one worker's LocMem copy; it is the
+# default only when CACHE_URL / CACHE_SESSIONS_URL is set.
+SESSION_BACKEND = os.environ.get("SESSION_BACKEND", "cached_db" if cache_url("sessions") else "db")
+if SESSION_BACKEND == "cached_db" and not cache_url("sessions"):
+    raise ImproperlyConfigured("SESSION_BACKEND=cached_db needs CACHE_URL or CACHE_SESSIONS_URL")
+SESSION_ENGINE = "django.contrib.sessions.backends." + SESSION_BACKEND
+SESSION_CACHE_ALIAS = "sessions"
+
+# Flash messages travel in their own signed cookie instead of overflowing
+# into the session
+MESSAGE_STORAGE = "django.contrib.messages.storage.cookie.CookieStorage"
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -141,6 +270,24 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Audio streaming (/api/songs/<pk>/stream/)
+# None: Django serves byte ranges itself
+# "accel": nginx X-Accel-Redirect to STREAMING_ACCEL_PREFIX (internal location -> MEDIA_ROOT)
+# "sendfile": Apache/lighttpd X-Sendfile with the absolute file path
+STREAMING_OFFLOAD = None
+STREAMING_ACCEL_PREFIX = "/protected-media/"
+
+# Fragment cache lifetime for the public catalog pages (seconds);
+# entries are also invalidated by Song/Artist generation bumps
+CATALOG_CACHE_TIMEOUT = 600
+
+# Background jobs (app/jobs.py): queued in the database and run by
+# `manage.py runworker`; True runs them inline in the request instead
+JOBS_EAGER = False
+
+# Decoder used for waveforms (app/waveform.py)
+FFMPEG_BINARY = "ffmpeg"
+
 # Login
 LOGIN_URL = "login"
 LOGIN_REDIRECT_URL = "login"
@@ -169,20 +316,29 @@ REST_FRAMEWORK = {
         # Session
         # "rest_framework.authentication.SessionAuthentication",
         # "rest_framework.authentication.TokenAuthentication",
-        # JWT
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        # JWT (simplejwt's JWTAuthentication with cached user lookups)
+        "app.authentication.CachedJWTAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
     ],
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 20,
+    # POST /api/songs/<pk>/play/ per client IP (app.api_views.PlayRateThrottle)
+    "DEFAULT_THROTTLE_RATES": {
+        "play": os.environ.get("PLAY_THROTTLE_RATE", "60/minute"),
+    },
     "DEFAULT_RENDERER_CLASSES": [
         "rest_framework.renderers.JSONRenderer",
         "rest_framework.renderers.BrowsableAPIRenderer",
     ],
 }
 
+SIMPLE_JWT = {
+    # Refresh-token blacklist checks go through a Bloom filter (app/authentication.py)
+    "TOKEN_REFRESH_SERIALIZER": "app.serializers.TokenRefreshSerializer",
+}
+
 # CORS settings
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",  # React dev server
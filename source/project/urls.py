@@ -23,5 +23,6 @@ urlpatterns = [
     # MVC
     path("", include("app.urls")),
     # API
+    path("api/async/", include("app.async_urls")),
     path("api/", include("app.api_urls")),
 ]